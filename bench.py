@@ -0,0 +1,166 @@
+"""Benchmark sem tela dos caminhos quentes do planner.
+
+Gera planilhas "Planilha SO" sintéticas (com datas/horas bagunçadas como as reais)
+e mede cada etapa separadamente:
+
+    ler_planilha, carregar_planilha (cache), indexar_semanas, dados_semana,
+    render semana/hoje (montagem a frio, re-render e contagem de controles),
+    passo do laço de quadros com N timers
+
+Uso:
+    python bench.py                          # 1k, 10k e 100k linhas
+    python bench.py --linhas 1000 1000000 --repeticoes 5 > bench_output.txt
+
+Cada resultado sai como uma linha JSON (stdout), para comparar entre versões.
+"""
+import argparse, asyncio, json, logging, os, random, statistics, sys, tempfile, time as _tempo
+from datetime import date, datetime, time, timedelta
+
+import flet as ft
+import main as app
+
+# ============================== Planilha sintética ==============================
+def _data_baguncada(d: date, rnd: random.Random):
+    r = rnd.random()
+    if r < 0.45: return datetime.combine(d, time(0, 0))
+    if r < 0.60: return d.strftime("%d/%m/%Y")
+    if r < 0.70: return d.strftime("%Y-%m-%d")
+    if r < 0.78: return d.strftime("%d-%m-%Y")
+    if r < 0.85: return d.strftime("%d/%m/%y")
+    if r < 0.90: return f"{d.day}/{d.month}/{d.year}"
+    if r < 0.95: return None
+    return rnd.choice(["a definir", "??", "31/02/2025", "remarcar"])
+
+def _hora_baguncada(rnd: random.Random):
+    h, m = rnd.randint(7, 18), rnd.choice([0, 15, 30, 45])
+    r = rnd.random()
+    if r < 0.40: return time(h, m)
+    if r < 0.55: return f"{h:02d}:{m:02d}"
+    if r < 0.65: return f"{h}h{m:02d}"
+    if r < 0.72: return str(h)
+    if r < 0.80: return h + m / 60
+    if r < 0.86: return f"{h:02d}:{m:02d}:00"
+    if r < 0.92: return None
+    return rnd.choice(["25:00", "24", "manhã", "99h", 27.5])   # os que o to_time_safe rejeita
+
+def gerar_planilha(path: str, linhas: int, no_dia: int, dia: date, seed: int = 42):
+    """`no_dia` linhas caem em `dia` (um dia lotado); o resto se espalha por ~2 anos."""
+    import openpyxl
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(app.ABA_EXCEL)
+    ws.append(["ID", "Data", "Hora formatada", "Nome", "Diretoria", "Gerência", "Equipamento", "Observação", "Status"])
+    inicio = dia - timedelta(days=365)
+    for i in range(linhas):
+        if i < no_dia:
+            d, hora = dia, time(rnd.randint(0, 23), rnd.randint(0, 59))
+        else:
+            d, hora = inicio + timedelta(days=rnd.randint(0, 730)), _hora_baguncada(rnd)
+        ws.append([i, d if i < no_dia else _data_baguncada(d, rnd), hora,
+                   f"Pessoa {i} Sobrenome", rnd.choice(["TI", "RH", "Financeiro", "Operações"]),
+                   f"Gerência {rnd.randint(1, 40)}", f"NB-{rnd.randint(1000, 9999)}", "x" * rnd.randint(0, 40),
+                   rnd.choice(["Agendado", "Entregue", "Remarcar"])])
+    wb.save(path)
+
+# ============================== Página sem tela ==============================
+class PaginaHeadless:
+    """Só o que main() usa de ft.Page; update() não envia nada, run_task() não agenda."""
+    def __init__(self, width: int = 1920, height: int = 1080):
+        self.width, self.height = width, height
+        self.overlay, self.controls = [], []
+        self.updates = 0
+
+    def add(self, *controls): self.controls.extend(controls)
+    def update(self, *controls): self.updates += 1
+    def run_task(self, handler, *args, **kwargs): return None
+
+def contar_controles(controles) -> int:
+    total, pilha = 0, list(controles)
+    while pilha:
+        c = pilha.pop()
+        total += 1
+        pilha.extend(c._get_children())
+    return total
+
+# ============================== Medição ==============================
+def medir(fn, repeticoes: int):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = _tempo.perf_counter(); fn(); tempos.append((_tempo.perf_counter() - t0) * 1000)
+    return {"min_ms": round(min(tempos), 3), "mediana_ms": round(statistics.median(tempos), 3)}
+
+def emitir(etapa: str, linhas: int, **dados):
+    print(json.dumps({"etapa": etapa, "linhas": linhas, **dados}, ensure_ascii=False), flush=True)
+
+def rodar(linhas: int, no_dia: int, n_timers: int, repeticoes: int, pasta: str):
+    hoje = datetime.now().date()
+    dia = hoje if hoje.weekday() <= 4 else hoje - timedelta(days=hoje.weekday() - 4)
+    path = os.path.join(pasta, f"sintetica_{linhas}.xlsx")
+    t0 = _tempo.perf_counter(); gerar_planilha(path, linhas, no_dia, dia)
+    emitir("gerar_planilha", linhas, ms=round((_tempo.perf_counter() - t0) * 1000, 3),
+           bytes=os.path.getsize(path))
+
+    df = app.ler_planilha(path)
+    emitir("ler_planilha", linhas, validas=len(df), **medir(lambda: app.ler_planilha(path), repeticoes))
+
+    app.PASTA_CACHE = os.path.join(pasta, "cache")
+    app.carregar_planilha(path)   # grava o snapshot
+    emitir("carregar_planilha_cache", linhas, **medir(lambda: app.carregar_planilha(path), repeticoes))
+
+    emitir("indexar_semanas", linhas, **medir(lambda: app.indexar_semanas(df), repeticoes))
+    indice = app.indexar_semanas(df)
+    semanas = sorted(indice)
+    emitir("dados_semana", linhas, semanas=len(semanas),
+           **medir(lambda: [indice.get(s) for s in semanas], repeticoes))
+
+    # main() inteiro numa página sem tela; os renders são medidos pelos ganchos que ele devolve
+    app.CAMINHO_EXCEL = path
+    app.PORTA_METRICAS = None
+    page = PaginaHeadless()
+    ui = app.main(page)
+    servico = ui["servico"]
+    asyncio.run(servico.carregar())
+    # a frio: semanas mais cheias, uma diferente por repetição (run_task não agenda a pré-carga)
+    cheias = sorted(indice, key=lambda s: -sum(len(v) for v in indice[s].values()))
+    for view in ("week", "day"):
+        etapa = "render_semana" if view == "week" else "render_hoje"
+        ui["state"]["view"] = view
+        fila = iter(cheias[1:])
+        ui["set_week"](*cheias[0])
+        emitir(f"{etapa}_frio", linhas, **medir(lambda: ui["set_week"](*next(fila)), min(repeticoes, len(cheias) - 1)))
+        ui["set_week"](*cheias[0])
+        emitir(etapa, linhas, controles=contar_controles(page.controls), **medir(ui["render"], repeticoes))
+
+    # um passo do laço de quadros (prazos no serviço + textos na sessão) com N timers correndo
+    rnd = random.Random(7)
+    servico.motor.limpar()
+    telas = ui["state"]["timers_tela"]
+    agora = datetime.now()
+    for i in range(n_timers):
+        alvo = agora + timedelta(seconds=rnd.randint(-600, 4 * 3600))
+        servico.motor.registrar({"chave": i, "alvo": alvo, "nome": f"Pessoa {i}", "warned": False, "due": False})
+        telas.append({"ctrl": ft.Text(""), "alvo": alvo})
+    def passo_timer():
+        agora = datetime.now()
+        servico.processar_prazos(agora)
+        ui["quadro"](agora)
+    emitir("passo_timer", linhas, timers=n_timers, **medir(passo_timer, repeticoes))
+
+def _args():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--linhas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--no-dia", type=int, default=250, help="linhas concentradas num único dia")
+    ap.add_argument("--timers", type=int, default=500, help="timers no passo do laço de quadros")
+    ap.add_argument("--repeticoes", type=int, default=3)
+    ap.add_argument("--pasta", default=None, help="onde gerar as planilhas (padrão: temporária)")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    args = _args()
+    logging.disable(logging.CRITICAL)   # erros de célula e de áudio sem tela não interessam aqui
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = args.pasta or tmp
+        os.makedirs(pasta, exist_ok=True)
+        for n in args.linhas:
+            rodar(n, min(args.no_dia, n), args.timers, args.repeticoes, pasta)
+    sys.exit(0)
@@ -0,0 +1,11 @@
+import logging
+
+import pytest
+
+import main as app
+
+@pytest.fixture(autouse=True)
+def sem_app_log(monkeypatch):
+    # os avisos dos testes não vão para o app.log do repositório (caplog continua vendo)
+    raiz = logging.getLogger()
+    monkeypatch.setattr(raiz, "handlers", [h for h in raiz.handlers if not isinstance(h, app.FilaLog)])
@@ -1,23 +1,229 @@
+from __future__ import annotations   # anotações com pd.* não importam o pandas na partida
+from time import perf_counter
+T_PARTIDA = perf_counter()           # referência do relatório de partida
 import flet as ft
-import pandas as pd
 from datetime import datetime, date, time, timedelta
-import logging, asyncio
-from typing import Optional, Tuple, List, Dict
-
-# ============================== Logger ==============================
-logging.basicConfig(
-    filename="app.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+import logging, logging.handlers, queue, atexit, signal, asyncio, os, hashlib, threading, json, heapq, math, sqlite3, importlib, importlib.util, html
+import http.client, urllib.parse
+from typing import Optional, Tuple, List, Dict, NamedTuple
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _ImportTardio:
+    """Módulo importado no primeiro uso: pandas/numpy só entram quando a carga começa,
+    depois da primeira pintura da tela."""
+    def __init__(self, nome: str):
+        self._nome, self._mod = nome, None
+
+    def __getattr__(self, attr):
+        if self._mod is None: self._mod = importlib.import_module(self._nome)
+        return getattr(self._mod, attr)
+
+pd = _ImportTardio("pandas")
+np = _ImportTardio("numpy")
 
 # ============================== Config ==============================
 MODO_TV = True                           # otimizações para exibir em TV
 SHOW_DROPDOWN = True                     # mostra o dropdown de semanas
 CAMINHO_EXCEL = r"C:\Users\Arklok\OneDrive - Quality Software SA\Documentos\Agendamentos_Rollout_2025_SO.xlsx"
 
-INTERVALO_ATUALIZA_TEMPORIZADOR = 1      # s (tempo real)
-INTERVALO_RELOAD_PLANILHA = 300          # s (recarregar Excel)
+QUADROS_POR_SEGUNDO_MAX = 1.0           # relógio + timers: 1 page.update() por quadro (TV fraca: 0.5)
+INTERVALO_VERIFICA_PLANILHA = 1         # s (checa se o Excel mudou; recarrega só se mudou)
+INTERVALO_VERIFICA_URL = 30              # s entre GETs condicionais quando CAMINHO_EXCEL é http(s)://
+CONFIRMAR_HASH_PLANILHA = True           # confirma a mudança pelo conteúdo (ignora "touch" do OneDrive)
+ABA_EXCEL = "Planilha SO"
+# várias planilhas/abas lidas em paralelo e juntadas; vazio = só CAMINHO_EXCEL/ABA_EXCEL.
+# ex.: [{"caminho": r"...\Rollout_Sul.xlsx", "tag": "Sul"}, {"caminho": "https://...", "aba": "Norte", "tag": "Norte"}]
+FONTES: List[Dict] = []
+TEMPO_MAX_FONTE = 120                    # s; fonte que demora mais fica com a leitura anterior nesta carga
+RETENTATIVA_FONTE_MAX = 300              # s; leitura que falhou é repetida em 5 s, 10 s, 20 s... até este intervalo
+# "calamine" (Rust, bem mais rápido; padrão se python-calamine estiver instalado) |
+# "openpyxl" (streaming, só as colunas usadas) | "pandas" (tudo)
+MOTOR_EXCEL = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+PASTA_CACHE = "cache"                    # snapshot da planilha já normalizada (partida rápida); None desliga
+MEMO_CELULAS_MAX = 20_000                 # valores brutos já convertidos (sobrevive às recargas)
+BANCO_SQLITE = None                      # ex.: "cache/historico.db": histórico indexado, só a semana pedida em memória
+PASTA_EXPORTACAO = None                  # ex.: "export": semana.html/hoje.html estáticos, regravados quando os dados mudam
+MODO_EXPORTACAO = False                  # True: sem janela, só mantém a exportação atualizada (telas fracas)
+PORTA_METRICAS = 8765                    # http://127.0.0.1:8765/metrics (JSON); None desliga
+MODO_SERVIDOR = False                    # True: app web; várias TVs assinam o mesmo serviço de dados
+HOST_SERVIDOR = "0.0.0.0"
+PORTA_SERVIDOR = 8550
+ARQUIVO_LOG = "app.log"
+LOG_MAX_BYTES = 5_000_000                # gira ao passar disso e na virada do dia
+LOG_BACKUPS = 10                         # app.log.1 ... app.log.10
+LOG_JANELA_REPETIDAS = 60                # s; mensagem idêntica dentro da janela só é contada
+
+# ============================== Logger ==============================
+class LogRotativo(logging.handlers.RotatingFileHandler):
+    """Gira por tamanho e na virada do dia (kiosque que roda meses)."""
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw); self._dia = date.today()
+
+    def shouldRollover(self, record) -> bool:
+        hoje = date.today()
+        if hoje != self._dia:
+            self._dia = hoje
+            return True
+        return super().shouldRollover(record)
+
+class FiltroRepetidas(logging.Filter):
+    """Roda na thread que loga: repetição idêntica dentro da janela nem entra na fila;
+    a próxima que passar leva o total suprimido."""
+    def __init__(self, janela: float = LOG_JANELA_REPETIDAS, maximo: int = 1000):
+        super().__init__(); self.janela = janela; self.maximo = maximo; self._lock = threading.Lock()
+        self.vistas: "OrderedDict[Tuple[str, int, str], list]" = OrderedDict()   # chave -> [t_liberada, suprimidas]
+
+    def filter(self, record) -> bool:
+        msg = record.getMessage()   # já com os args: "%s" de arquivos diferentes não são repetição
+        chave = (record.name, record.levelno, msg); agora = perf_counter()
+        with self._lock:
+            visto = self.vistas.get(chave)
+            if visto is not None and agora - visto[0] < self.janela:
+                visto[1] += 1
+                return False
+            if visto is not None and visto[1]:
+                record.msg, record.args = f"{msg} (repetida {visto[1]}x nos últimos {agora - visto[0]:.0f}s)", None
+            self.vistas[chave] = [agora, 0]; self.vistas.move_to_end(chave)
+            if len(self.vistas) > self.maximo: self.vistas.popitem(last=False)
+        return True
+
+class FilaLog(logging.handlers.QueueHandler):
+    """Mesmo processo: o registro vai como está; a formatação fica com a thread do listener."""
+    def prepare(self, record):
+        return record
+
+_listeners_log: List[logging.handlers.QueueListener] = []
+_handlers_log: List[logging.Handler] = []
+
+def configurar_log():
+    """Laço de eventos/quadros só enfileiram; gravar e girar o arquivo é do listener."""
+    raiz = logging.getLogger()
+    arquivo = LogRotativo(ARQUIVO_LOG, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    arquivo.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    _handlers_log.append(arquivo)
+    fila = queue.SimpleQueue()
+    fila_handler = FilaLog(fila); fila_handler.addFilter(FiltroRepetidas())
+    raiz.addHandler(fila_handler); raiz.setLevel(logging.INFO)
+    listener = logging.handlers.QueueListener(fila, arquivo, respect_handler_level=True)
+    listener.start(); _listeners_log.append(listener)
+    atexit.register(parar_log)
+
+def parar_log():
+    while _listeners_log: _listeners_log.pop().stop()   # esvazia a fila antes de sair
+    for h in _handlers_log: h.close()
+
+def fila_log_processos(ctx):
+    """Fila entre processos para os leitores do pool; escoa nos mesmos handlers do arquivo."""
+    fila = ctx.Queue()
+    listener = logging.handlers.QueueListener(fila, *_handlers_log, respect_handler_level=True)
+    listener.start(); _listeners_log.append(listener)
+    return fila
+
+def _log_no_processo(fila, pids=None):
+    if pids is not None: pids.put(os.getpid())   # para descartar_pool poder encerrar um leitor travado
+    raiz = logging.getLogger()
+    for h in list(raiz.handlers): raiz.removeHandler(h)
+    raiz.addHandler(logging.handlers.QueueHandler(fila)); raiz.setLevel(logging.INFO)
+
+from multiprocessing import parent_process
+if parent_process() is None:   # leitores do pool (spawn) logam pela fila do processo principal
+    configurar_log()
+
+# ============================== Métricas ==============================
+class Histograma:
+    """Janela móvel das últimas N amostras (ms, bytes...)."""
+    def __init__(self, tamanho: int = 512):
+        self.valores = deque(maxlen=tamanho); self.total = 0
+
+    def registrar(self, v: float):
+        self.valores.append(v); self.total += 1
+
+    def resumo(self) -> Dict[str, float]:
+        vs = sorted(self.valores)
+        if not vs: return {"n": self.total}
+        pct = lambda p: vs[min(len(vs) - 1, int(p * len(vs)))]
+        return {"n": self.total, "ultimo": round(self.valores[-1], 3), "p50": round(pct(0.50), 3),
+                "p95": round(pct(0.95), 3), "max": round(vs[-1], 3)}
+
+class Metricas:
+    def __init__(self):
+        self._hist: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()   # a carga registra da thread de leitura
+
+    def registrar(self, nome: str, valor: float):
+        with self._lock:
+            h = self._hist.get(nome)
+            if h is None: h = self._hist[nome] = Histograma()
+            h.registrar(valor)
+
+    @contextmanager
+    def medir(self, nome: str):
+        t0 = perf_counter()
+        try: yield
+        finally: self.registrar(nome, (perf_counter() - t0) * 1000)
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {nome: h.resumo() for nome, h in sorted(self._hist.items())}
+
+METRICAS = Metricas()
+
+def _tamanho_comandos(comandos) -> Tuple[int, int]:
+    # estimativa barata do que vai pelo fio: (nº de comandos, bytes de nomes/valores/atributos)
+    n = b = 0
+    pilha = list(comandos)
+    while pilha:
+        c = pilha.pop()
+        n += 1
+        b += len(c.name or "") + sum(len(str(v)) for v in c.values)
+        b += sum(len(k) + len(str(v)) for k, v in c.attrs.items())
+        pilha.extend(c.commands)
+    return n, b
+
+def instrumentar_conexao(conn):
+    """Mede cada page.update(): comandos e bytes enviados ao cliente Flet."""
+    if conn is None or getattr(conn.send_commands, "_instrumentado", False): return
+    original = conn.send_commands
+    def send_commands(session_id, commands):
+        n, b = _tamanho_comandos(commands)
+        METRICAS.registrar("update_comandos", n); METRICAS.registrar("update_bytes", b)
+        return original(session_id, commands)
+    send_commands._instrumentado = True
+    conn.send_commands = send_commands
+
+_servidor_metricas = None
+
+def iniciar_servidor_metricas(porta: Optional[int]):
+    """GET /metrics em 127.0.0.1 (só local), numa thread daemon; uma vez por processo."""
+    global _servidor_metricas
+    if not porta or _servidor_metricas is not None: return
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404); return
+            corpo = json.dumps(METRICAS.resumo(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers(); self.wfile.write(corpo)
+        def log_message(self, *args): pass   # não encher o app.log com cada GET
+    try:
+        _servidor_metricas = ThreadingHTTPServer(("127.0.0.1", porta), _Handler)
+        threading.Thread(target=_servidor_metricas.serve_forever, daemon=True).start()
+        logging.info(f"Métricas em http://127.0.0.1:{porta}/metrics")
+    except OSError as e:
+        logging.error(f"iniciar_servidor_metricas: {e}")
+
+PARTIDA: Dict[str, float] = {}   # etapa -> segundos desde T_PARTIDA (uma vez por processo)
+
+def marcar_partida(etapa: str):
+    if etapa in PARTIDA: return
+    PARTIDA[etapa] = perf_counter() - T_PARTIDA
+    METRICAS.registrar(f"partida_{etapa}_ms", PARTIDA[etapa] * 1000)
+    if etapa == "completa":
+        logging.info("Partida: " + " • ".join(f"{k} {v:.2f}s" for k, v in PARTIDA.items()))
 
 # ============================== Paleta ==============================
 def paleta():
@@ -42,19 +248,22 @@ def make_sz(fixed_scale: float):
     return sz
 
 # ============================== Datas / Horas ==============================
+FMT_DATAS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y")
+FMT_HORAS = ("%H:%M", "%H:%M:%S")
+
 def to_date_safe(v) -> Optional[date]:
     try:
         if isinstance(v, (pd.Timestamp, datetime)): return v.date()
         if isinstance(v, date): return v
         if isinstance(v, str):
-            for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"):
+            for fmt in FMT_DATAS:
                 try: return datetime.strptime(v, fmt).date()
                 except: pass
             return pd.to_datetime(v, dayfirst=True, errors="coerce").date()
         if pd.isna(v): return None
         return pd.to_datetime(v, errors="coerce").date()
-    except Exception as e:
-        logging.error(f"to_date_safe: {e}"); return None
+    except Exception:
+        return None   # falhas entram no resumo da carga (falhas_conversao), não uma linha de log por célula
 
 def to_time_safe(v) -> Optional[time]:
     try:
@@ -66,14 +275,137 @@ def to_time_safe(v) -> Optional[time]:
         if isinstance(v, str):
             s = v.strip().replace("h", ":").replace("H", ":")
             if ":" not in s and s.isdigit(): s = f"{s}:00"
-            for fmt in ("%H:%M","%H:%M:%S"):
+            for fmt in FMT_HORAS:
                 try: return datetime.strptime(s, fmt).time().replace(second=0, microsecond=0)
                 except: pass
             ts = pd.to_datetime(s, errors="coerce")
             if ts is not pd.NaT: return ts.time().replace(second=0, microsecond=0)
         return None
-    except Exception as e:
-        logging.error(f"to_time_safe: {e}"); return None
+    except Exception:
+        return None
+
+class MemoCelulas:
+    """LRU limitado valor bruto -> convertido em volta de um conversor célula a célula.
+    Global: a mesma célula ruim não é reprocessada a cada recarga da planilha."""
+    def __init__(self, conversor, maximo: int = MEMO_CELULAS_MAX):
+        self.conversor, self.maximo = conversor, maximo
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()   # cargas rodam em thread
+
+    def __call__(self, v):
+        chave = (type(v), v)            # 1, 1.0 e True não podem cair na mesma entrada
+        try:
+            with self._lock:
+                self._cache.move_to_end(chave)
+                return self._cache[chave]
+        except KeyError: pass
+        except TypeError: return self.conversor(v)   # não hasheável
+        r = self.conversor(v)
+        with self._lock:
+            self._cache[chave] = r
+            if len(self._cache) > self.maximo: self._cache.popitem(last=False)
+        return r
+
+data_memo = MemoCelulas(to_date_safe)
+hora_memo = MemoCelulas(to_time_safe)
+
+# --- versões vetorizadas: mesmo resultado de to_date_safe/to_time_safe, em lote ---
+def _parse_formatos(s: pd.Series, formatos, conv) -> pd.Series:
+    """Tenta cada formato só nas linhas que falharam no anterior; devolve objetos já passados
+    por conv (None = nenhum serviu)."""
+    out = pd.Series(None, index=s.index, dtype=object)   # sem datetime64[ns]: ano 205 ou 2999 não cabe
+    pend = s
+    for fmt in formatos:
+        if pend.empty: break
+        ts = pd.to_datetime(pend, format=fmt, errors="coerce")
+        ok = ts.notna()
+        # segundo 60/61: o pandas vira o minuto, o strptime célula a célula recusa ("07:05:60" => None)
+        if "%S" in fmt: ok &= ~pend.str.contains(r":6[01]$")
+        if ok.any(): out[ok[ok].index] = conv(ts[ok])
+        pend = pend[~ok]
+    return out
+
+def normalizar_datas(s: pd.Series) -> pd.Series:
+    out = pd.Series(None, index=s.index, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        ok = s.notna()
+        out[ok] = s[ok].dt.date
+        return out.where(out.notna(), None)
+    tipos = s.map(type)
+    m_dt = tipos.isin((pd.Timestamp, datetime))
+    if m_dt.any():
+        ts = pd.to_datetime(s[m_dt], errors="coerce")
+        ok = ts.notna()
+        out[ok[ok].index] = ts[ok].dt.date
+    m_d = tipos == date
+    out[m_d] = s[m_d]
+    m_s = tipos == str
+    if m_s.any():
+        conv = _parse_formatos(s[m_s], FMT_DATAS, lambda ts: ts.dt.date)
+        ok = conv.notna()
+        out[ok[ok].index] = conv[ok]
+    # o que sobrou (fora do padrão, números, ano fora da faixa) vai pelo conversor célula a célula
+    pend = out.isna() & s.notna()
+    if pend.any():
+        out[pend] = s[pend].map(data_memo)
+    return out.where(out.notna(), None)
+
+def normalizar_horas(s: pd.Series) -> pd.Series:
+    out = pd.Series(None, index=s.index, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        ok = s.notna()
+        out[ok] = s[ok].dt.floor("min").dt.time
+        return out.where(out.notna(), None)
+    tipos = s.map(type)
+    m_t = tipos == time
+    if m_t.any():
+        out[m_t] = [t.replace(second=0, microsecond=0) for t in s[m_t]]
+    m_dt = tipos.isin((pd.Timestamp, datetime))
+    if m_dt.any():
+        ts = pd.to_datetime(s[m_dt], errors="coerce")
+        ok = ts.notna()
+        out[ok[ok].index] = ts[ok].dt.floor("min").dt.time
+    m_n = tipos.isin((int, float))
+    if m_n.any():
+        v = pd.to_numeric(s[m_n], errors="coerce").astype(float)
+        h = np.trunc(v); m = np.round((v - h) * 60)  # int() trunca; round() é meio-para-par
+        ok = v.notna() & (h >= 0) & (h <= 23) & (m >= 0) & (m <= 59)
+        if ok.any():
+            out[ok[ok].index] = pd.to_datetime(h[ok] * 60 + m[ok], unit="m").dt.time
+    m_s = tipos == str
+    if m_s.any():
+        t = s[m_s].str.strip().str.replace("h", ":", regex=False).str.replace("H", ":", regex=False)
+        so_dig = ~t.str.contains(":", regex=False) & t.str.isdigit()
+        t[so_dig] = t[so_dig] + ":00"
+        conv = _parse_formatos(t, FMT_HORAS, lambda ts: ts.dt.floor("min").dt.time)
+        ok = conv.notna()
+        out[ok[ok].index] = conv[ok]
+    # inválidos (hora > 23, formatos livres, tipos raros) caem no conversor célula a célula
+    pend = out.isna() & s.notna()
+    if pend.any():
+        out[pend] = s[pend].map(hora_memo)
+    return out.where(out.notna(), None)
+
+def falhas_conversao(bruto: pd.Series, convertido: pd.Series, coluna: str) -> List[Tuple]:
+    """Células preenchidas que não viraram data/hora: (linha, coluna, valor bruto, ocorrências),
+    uma entrada por valor distinto, com a primeira linha onde apareceu (o índice de ler_excel
+    já é a linha do Excel)."""
+    vazio = bruto.isna() | (bruto.astype(str).str.strip() == "")
+    ruins = bruto[~vazio & convertido.isna()]
+    vistos: Dict[Tuple, List] = {}
+    for i, v in ruins.items():
+        item = vistos.setdefault((type(v), str(v)), [i, coluna, v, 0])
+        item[3] += 1
+    return [tuple(item) for item in vistos.values()]
+
+def registrar_falhas(falhas: List[Tuple], origem: str, limite: int = 20):
+    if not falhas: return
+    total = sum(f[3] for f in falhas)
+    METRICAS.registrar("falhas_celulas", total)
+    logging.warning(f"ler_planilha: {total} células sem conversão em {origem} ({len(falhas)} valores distintos)")
+    for linha, coluna, v, n in sorted(falhas, key=lambda f: -f[3])[:limite]:
+        logging.warning(f"  linha {linha} • {coluna} = {v!r} ({n}x)")
+    if len(falhas) > limite: logging.warning(f"  ... mais {len(falhas) - limite} valores")
 
 def calcular_temporizador(h: Optional[time], d: Optional[date] = None) -> timedelta:
     try:
@@ -84,6 +416,10 @@ def calcular_temporizador(h: Optional[time], d: Optional[date] = None) -> timede
     except Exception as e:
         logging.error(f"calcular_temporizador: {e}"); return timedelta(0)
 
+def texto_temporizador(restante: timedelta) -> str:
+    seg = int(restante.total_seconds())
+    return f"Tempo até entrega: {seg // 3600:02d}:{seg % 3600 // 60:02d}:{seg % 60:02d}"
+
 def semana_iso_de(d: date) -> Tuple[int, int]:
     iso = d.isocalendar(); return iso[0], iso[1]
 
@@ -97,31 +433,89 @@ COL_NOME = ["Nome","NOME","Colaborador","Usuário","Pessoa"]
 COL_DIR  = ["Diretoria","DIRETORIA","Dir"]
 COL_GER  = ["Gerencia","Gerência","GERENCIA","GERÊNCIA","Ger"]
 
-def achar_col(df: pd.DataFrame, alts: List[str]) -> Optional[str]:
+def achar_nome(colunas, alts: List[str]) -> Optional[str]:
+    colunas = [c for c in colunas if isinstance(c, str)]
     for c in alts:
-        if c in df.columns: return c
-    low = {c.lower(): c for c in df.columns}
+        if c in colunas: return c
+    low = {c.lower(): c for c in colunas}
     for c in alts:
         if c.lower() in low: return low[c.lower()]
     return None
 
-def ler_planilha(path: str) -> pd.DataFrame:
+def achar_col(df: pd.DataFrame, alts: List[str]) -> Optional[str]:
+    return achar_nome(df.columns, alts)
+
+def colunas_usadas(cabecalho) -> List[str]:
+    """Resolve os aliases COL_* no cabeçalho; só essas colunas são lidas do Excel."""
+    achadas = (achar_nome(cabecalho, alts) for alts in (COL_DATA, COL_HORA, COL_NOME, COL_DIR, COL_GER))
+    return [c for c in achadas if c]
+
+def _ler_excel_openpyxl(path: str, aba: str) -> pd.DataFrame:
+    # modo read_only: percorre as linhas em streaming, só no intervalo das colunas usadas
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     try:
-        df = pd.read_excel(path, sheet_name="Planilha SO")
+        ws = wb[aba]
+        cab = list(next(ws.iter_rows(max_row=1, values_only=True), None) or [])
+        usadas = colunas_usadas(cab)
+        if not usadas: return pd.DataFrame(columns=[c for c in cab if isinstance(c, str)])
+        pos = {c: cab.index(c) for c in usadas}
+        primeira, ultima = min(pos.values()), max(pos.values())
+        pos = {c: i - primeira for c, i in pos.items()}   # posição dentro do recorte lido
+        valores = {c: [] for c in usadas}
+        numeros = []   # linha de cada registro no Excel: as vazias são puladas
+        linhas = ws.iter_rows(min_row=2, min_col=primeira + 1, max_col=ultima + 1, values_only=True)
+        for n, row in enumerate(linhas, start=2):
+            if not any(v is not None for v in row): continue
+            numeros.append(n)
+            for c, i in pos.items():
+                valores[c].append(row[i] if i < len(row) else None)
+    finally:
+        wb.close()
+    return pd.DataFrame({c: pd.Series(v, index=numeros, dtype=object).infer_objects() for c, v in valores.items()},
+                        index=numeros)
+
+def _ler_excel_calamine(path: str, aba: str) -> pd.DataFrame:
+    cab = pd.read_excel(path, sheet_name=aba, engine="calamine", nrows=0).columns
+    return pd.read_excel(path, sheet_name=aba, engine="calamine", usecols=colunas_usadas(cab))
+
+def ler_excel(path: str, aba: str = ABA_EXCEL) -> pd.DataFrame:
+    """Índice = número da linha no Excel (cabeçalho na 1), para os avisos de conversão."""
+    df = None
+    if MOTOR_EXCEL == "calamine":
+        try:
+            import python_calamine  # noqa: F401
+            df = _ler_excel_calamine(path, aba)
+        except ImportError:
+            logging.error("ler_excel: python-calamine não instalado, usando openpyxl")
+    elif MOTOR_EXCEL == "pandas":
+        df = pd.read_excel(path, sheet_name=aba)
+    if df is None: return _ler_excel_openpyxl(path, aba)
+    df.index += 2   # read_excel mantém as linhas vazias: posição + cabeçalho + base 1
+    return df
+
+def ler_planilha(path: str, aba: str = ABA_EXCEL, origem: Optional[str] = None) -> pd.DataFrame:
+    try:
+        df = ler_excel(path, aba)
         cd = achar_col(df, COL_DATA); ch = achar_col(df, COL_HORA); cn = achar_col(df, COL_NOME)
         if not (cd and cn):
             logging.error(f"Faltam colunas. Data:{cd} Nome:{cn}")
             return pd.DataFrame()
-        df["_Data"] = df[cd].apply(to_date_safe)
-        df["_Hora"] = df[ch].apply(to_time_safe) if ch else None
+        df["_Data"] = normalizar_datas(df[cd])
+        df["_Hora"] = normalizar_horas(df[ch]) if ch else None
+        falhas = falhas_conversao(df[cd], df["_Data"], cd)
+        if ch: falhas += falhas_conversao(df[ch], df["_Hora"], ch)
+        registrar_falhas(falhas, origem or f"{path} [{aba}]")   # uma vez por carga, agrupado por valor
         df["_Nome"] = df[cn].astype(str).fillna("Sem nome")
         cd2 = achar_col(df, COL_DIR); cg2 = achar_col(df, COL_GER)
         df["_Diretoria"] = df[cd2].astype(str).fillna("") if cd2 else ""
         df["_Gerencia"]  = df[cg2].astype(str).fillna("") if cg2 else ""
         df = df.dropna(subset=["_Data"]).copy()
-        df["_DiaSemana"] = df["_Data"].apply(lambda d: d.weekday())
+        dts = pd.to_datetime(df["_Data"])
+        df["_DiaSemana"] = dts.dt.weekday.astype(int)
         df = df[df["_DiaSemana"] <= 4].copy()  # seg..sex
-        df[["_AnoISO","_SemanaISO"]] = df["_Data"].apply(lambda d: pd.Series(semana_iso_de(d)))
+        iso = dts[df.index].dt.isocalendar()
+        df["_AnoISO"] = iso["year"].astype(int); df["_SemanaISO"] = iso["week"].astype(int)
         df.sort_values(by=["_Data","_Hora","_Nome"], inplace=True, kind="stable")
         df.reset_index(drop=True, inplace=True)
         return df
@@ -129,10 +523,967 @@ def ler_planilha(path: str) -> pd.DataFrame:
         logging.error(f"ler_planilha: {e}")
         return pd.DataFrame()
 
+# ============================== Índice semana/dia ==============================
+class Compromisso(NamedTuple):
+    """Só o que a tela usa de uma linha; criado uma vez por carga e compartilhado
+    por índice, cards e timers."""
+    data: date
+    hora: Optional[time]
+    nome: str
+    diretoria: str
+    gerencia: str
+    fonte: str     # tag da planilha de origem ("" com fonte única)
+    chave: Tuple   # (data, hora, nome, nº da repetição da linha, fonte): identidade estável
+
+IndiceSemanas = Dict[Tuple[int, int], Dict[int, List[Compromisso]]]   # (ano ISO, semana ISO) -> dia (0=seg) -> registros
+
+def chave_ordem_registro(r: Tuple):
+    return (r[1] is None, r[1] or time(23,59), r[2] or "", r[5])
+
+def indexar_semanas(df: pd.DataFrame) -> IndiceSemanas:
+    """Monta uma vez por carga; cada dia já sai ordenado por hora/nome."""
+    indice: IndiceSemanas = {}
+    if df.empty: return indice
+    brutos: Dict[Tuple[int, int], Dict[int, List[Tuple]]] = {}
+    fontes = df["_Fonte"] if "_Fonte" in df else [""] * len(df)
+    for linha in zip(df["_Data"], df["_Hora"], df["_Nome"], df["_Diretoria"], df["_Gerencia"], fontes,
+                     df["_AnoISO"], df["_SemanaISO"], df["_DiaSemana"]):
+        dias = brutos.get(linha[6:8])
+        if dias is None:
+            dias = brutos[linha[6:8]] = {i: [] for i in range(5)}
+        dias[linha[8]].append(linha[:6])
+    for semana, dias in brutos.items():
+        indice[semana] = {i: compromissos_do_dia(regs) for i, regs in dias.items()}
+    return indice
+
+def compromissos_do_dia(linhas: List[Tuple]) -> List[Compromisso]:
+    linhas.sort(key=chave_ordem_registro)
+    registros = []
+    ocorrencias: Dict[Tuple, int] = {}
+    for d, h, nome, diret, ger, fonte in linhas:
+        h = h if isinstance(h, time) else None
+        base = (d, h, nome, fonte)
+        n = ocorrencias[base] = ocorrencias.get(base, -1) + 1   # linhas repetidas na planilha
+        registros.append(Compromisso(d, h, nome, diret or "", ger or "", fonte, (d, h, nome, n, fonte)))
+    return registros
+
+class Mudancas(NamedTuple):
+    novos: List[Compromisso]
+    alterados: List[Compromisso]   # mesma chave, outros campos (diretoria/gerência)
+    removidos: List[Compromisso]
+    semanas: set                   # (ano ISO, semana ISO) afetadas
+
+def diferenca_indices(antigo: IndiceSemanas, novo: IndiceSemanas) -> Mudancas:
+    """Changeset entre duas cargas pela chave estável; semanas iguais saem numa comparação só."""
+    novos, alterados, removidos, semanas = [], [], [], set()
+    for semana in antigo.keys() | novo.keys():
+        a, n = antigo.get(semana) or {}, novo.get(semana) or {}
+        if a == n: continue
+        semanas.add(semana)
+        va = {r.chave: r for regs in a.values() for r in regs}
+        vn = {r.chave: r for regs in n.values() for r in regs}
+        for chave, r in vn.items():
+            if chave not in va: novos.append(r)
+            elif va[chave] != r: alterados.append(r)
+        removidos.extend(r for chave, r in va.items() if chave not in vn)
+    return Mudancas(novos, alterados, removidos, semanas)
+
+# ============================== Motor de timers ==============================
+class MotorTimers:
+    """Prazos de aviso (15 min antes) e de entrega num min-heap: as transições só são
+    avaliadas quando um prazo vence; a cada segundo só se reescreve o texto dos ativos."""
+    AVISO = timedelta(minutes=15)
+
+    def __init__(self):
+        self.ativos: Dict[int, Dict] = {}   # id(timer) -> timer ainda correndo (com ou sem card instanciado)
+        self._heap: List[Tuple[datetime, int, str, Dict]] = []
+        self._seq = 0
+
+    def __len__(self): return len(self.ativos)
+
+    def limpar(self):
+        self.ativos.clear(); self._heap.clear()
+
+    def registrar(self, timer: Dict):
+        self.ativos[id(timer)] = timer
+        for kind, prazo in (("warn", timer["alvo"] - self.AVISO), ("due", timer["alvo"])):
+            self._seq += 1
+            heapq.heappush(self._heap, (prazo, self._seq, kind, timer))
+
+    def remover(self, timer: Dict):
+        # remoção preguiçosa: as entradas no heap ficam, mas são ignoradas quando vencem
+        timer["cancelado"] = True
+        self.ativos.pop(id(timer), None)
+
+    def proximo_prazo(self) -> Optional[datetime]:
+        while self._heap and self._heap[0][3].get("cancelado"): heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def vencidos(self, agora: datetime) -> List[Tuple[str, Dict]]:
+        """Tira do heap os prazos <= agora, em ordem; um aviso já vencido junto com a entrega é descartado."""
+        out = []
+        while self._heap and self._heap[0][0] <= agora:
+            _, _, kind, timer = heapq.heappop(self._heap)
+            if timer.get("cancelado"): continue
+            if kind == "warn" and timer["alvo"] <= agora: continue
+            if kind == "due": self.ativos.pop(id(timer), None)
+            out.append((kind, timer))
+        return out
+
+# ============================== Monitor de arquivo ==============================
+try:  # opcional: eventos do SO (inotify/ReadDirectoryChangesW); sem ele, só polling de stat
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+def fingerprint_arquivo(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path); return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def hash_arquivo(path: str) -> Optional[str]:
+    try:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""): h.update(bloco)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+class MonitorArquivo:
+    """Detecta mudança real no arquivo: stat (mtime+tamanho) estável por uma checagem e,
+    se pedido, conteúdo diferente do último carregado."""
+    REVISAO_SEM_EVENTO = 30  # s; com watchdog ativo, ainda confere o stat de tempos em tempos
+    _NADA = object()
+
+    def __init__(self, path: str, confirmar_hash: bool = True):
+        self.path = path
+        self.confirmar_hash = confirmar_hash
+        self.fp = None; self.hash = None
+        self._pendente = self._NADA      # fingerprint novo aguardando estabilizar
+        self._conferido = None           # (fp, hash) que mudou() já calculou: marcar() não relê o arquivo
+        self._evento = threading.Event()
+        self._ultima_checagem = 0.0
+        self._observer = None
+        if Observer is not None:
+            try:
+                alvo, evento = os.path.abspath(path), self._evento
+                class _Handler(FileSystemEventHandler):
+                    def on_any_event(self, event):
+                        caminhos = (event.src_path, getattr(event, "dest_path", "") or "")
+                        if alvo in (os.path.abspath(c) for c in caminhos if c): evento.set()
+                self._observer = Observer()
+                self._observer.schedule(_Handler(), os.path.dirname(os.path.abspath(path)) or ".", recursive=False)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                logging.error(f"MonitorArquivo watchdog: {e}"); self._observer = None
+
+    def marcar(self):
+        """Registra o estado atual como o carregado (chamar ANTES de ler o arquivo)."""
+        self.fp = fingerprint_arquivo(self.path)
+        if self._conferido is not None and self._conferido[0] == self.fp: self.hash = self._conferido[1]
+        else: self.hash = hash_arquivo(self.path) if (self.confirmar_hash and self.fp) else None
+        self._pendente = self._NADA; self._conferido = None
+        self._evento.clear()
+
+    def mudou(self) -> bool:
+        agora = datetime.now().timestamp()
+        if self._observer is not None and self._pendente is self._NADA and not self._evento.is_set() \
+                and agora - self._ultima_checagem < self.REVISAO_SEM_EVENTO:
+            return False
+        self._ultima_checagem = agora
+        self._evento.clear()
+        fp = fingerprint_arquivo(self.path)
+        if fp == self.fp:
+            self._pendente = self._NADA; return False
+        if fp != self._pendente:          # ainda sendo gravado/sincronizado: espera estabilizar
+            self._pendente = fp; self._evento.set(); return False
+        self._pendente = self._NADA
+        if self.confirmar_hash and fp is not None and self.hash is not None:
+            hsh = hash_arquivo(self.path)
+            if hsh == self.hash:
+                self.fp = fp; return False   # só metadados mudaram
+            self._conferido = (fp, hsh)
+        return True
+
+# ============================== Fonte HTTP ==============================
+def eh_url(path: str) -> bool:
+    return str(path).lower().startswith(("http://", "https://"))
+
+class FonteHTTP:
+    """Planilha publicada por URL: GET condicional (ETag / If-Modified-Since) numa conexão
+    reaproveitada. A última cópia boa fica em disco e é ela que o resto do app lê."""
+    TIMEOUT = 20
+    REDIRECIONAMENTOS = 5
+
+    def __init__(self, url: str, pasta: str):
+        self.url = url
+        chave = hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+        self.arquivo = os.path.join(pasta, f"fonte_{chave}.xlsx")
+        self._arq_meta = self.arquivo + ".json"
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._origem = None   # (esquema, host) da conexão aberta
+        self._lock = threading.Lock()
+        try:
+            with open(self._arq_meta, encoding="utf-8") as f: self.validadores = json.load(f)
+        except (OSError, ValueError):
+            self.validadores = {}
+
+    def _conexao(self, esquema: str, host: str) -> http.client.HTTPConnection:
+        if self._conn is None or self._origem != (esquema, host):
+            self._fechar()
+            cls = http.client.HTTPSConnection if esquema == "https" else http.client.HTTPConnection
+            self._conn, self._origem = cls(host, timeout=self.TIMEOUT), (esquema, host)
+        return self._conn
+
+    def _fechar(self):
+        if self._conn is not None: self._conn.close()
+        self._conn = self._origem = None
+
+    def _get(self, url: str, cabecalhos: Dict) -> Tuple[int, Dict, bytes, str]:
+        for _ in range(self.REDIRECIONAMENTOS):
+            u = urllib.parse.urlsplit(url)
+            alvo = (u.path or "/") + (f"?{u.query}" if u.query else "")
+            for tentativa in (1, 2):   # keep-alive pode ter sido fechado pelo servidor entre as checagens
+                try:
+                    conn = self._conexao(u.scheme, u.netloc)
+                    conn.request("GET", alvo, headers=cabecalhos)
+                    resp = conn.getresponse()
+                    corpo = resp.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    self._fechar()
+                    if tentativa == 2: raise
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                url = urllib.parse.urljoin(url, resp.getheader("Location")); continue
+            return resp.status, {k.lower(): v for k, v in resp.getheaders()}, corpo, url
+        raise http.client.HTTPException("redirecionamentos demais")
+
+    def buscar(self) -> bool:
+        """True se baixou conteúdo novo; 304, erro ou conteúdo igual => False (fica a cópia boa)."""
+        with self._lock:
+            cab = {"Accept-Encoding": "identity"}
+            if os.path.exists(self.arquivo):
+                if self.validadores.get("etag"): cab["If-None-Match"] = self.validadores["etag"]
+                if self.validadores.get("last_modified"): cab["If-Modified-Since"] = self.validadores["last_modified"]
+            try:
+                with METRICAS.medir("http_ms"):
+                    status, cabecalhos, corpo, _ = self._get(self.url, cab)
+            except Exception as e:
+                logging.error(f"FonteHTTP {self.url}: {e} (mantendo a última cópia)"); return False
+            if status == 304: return False
+            if status != 200:
+                logging.error(f"FonteHTTP {self.url}: HTTP {status} (mantendo a última cópia)"); return False
+            self.validadores = {"etag": cabecalhos.get("etag"), "last_modified": cabecalhos.get("last-modified")}
+            try:
+                os.makedirs(os.path.dirname(self.arquivo) or ".", exist_ok=True)
+                novo = hashlib.blake2b(corpo, digest_size=16).hexdigest() != hash_arquivo(self.arquivo)
+                if novo:
+                    with open(self.arquivo + ".tmp", "wb") as f: f.write(corpo)
+                    os.replace(self.arquivo + ".tmp", self.arquivo)
+                with open(self._arq_meta, "w", encoding="utf-8") as f: json.dump(self.validadores, f)
+                return novo
+            except OSError as e:
+                logging.error(f"FonteHTTP gravar: {e}"); return False
+
+class MonitorHTTP:
+    """Mesma interface do MonitorArquivo para uma FonteHTTP: 'mudou' é um GET condicional."""
+    def __init__(self, fonte: FonteHTTP):
+        self.fonte = fonte
+        self._ultima_checagem = 0.0
+        self._baixado = False   # mudou() já trouxe a cópia nova que a carga vai ler
+
+    def marcar(self):
+        # antes de ler: garante a cópia local em dia (na primeira carga, ou se a carga não veio de mudou())
+        if not self._baixado: self.fonte.buscar()
+        self._baixado = False
+        self._ultima_checagem = datetime.now().timestamp()
+
+    def mudou(self) -> bool:
+        agora = datetime.now().timestamp()
+        if agora - self._ultima_checagem < INTERVALO_VERIFICA_URL: return False
+        self._ultima_checagem = agora
+        self._baixado = self.fonte.buscar()
+        return self._baixado
+
+# ============================== Cache da planilha ==============================
+VERSAO_CACHE = 1   # subir sempre que mudar a normalização/colunas abaixo
+COLS_CACHE = ["_Data","_Hora","_Nome","_Diretoria","_Gerencia","_DiaSemana","_AnoISO","_SemanaISO"]
+
+# parquet colunar com pyarrow; sem ele cai no pickle (só procura o pacote, sem importar)
+FORMATO_CACHE = "parquet" if importlib.util.find_spec("pyarrow") else "pickle"
+
+def _arquivos_cache(path: str, aba: str) -> Tuple[str, str]:
+    chave = hashlib.blake2b(f"{os.path.abspath(path)}\0{aba}".encode("utf-8"), digest_size=8).hexdigest()
+    base = os.path.join(PASTA_CACHE, f"planilha_{chave}")
+    return f"{base}.{FORMATO_CACHE}", f"{base}.json"
+
+def ler_cache(path: str, aba: str = ABA_EXCEL, validar: bool = True, fp: Optional[Tuple[int, int]] = None,
+              obter_hash=None) -> Optional[pd.DataFrame]:
+    """validar=False devolve o último snapshot mesmo que a planilha tenha mudado (partida rápida).
+    fp/obter_hash: o estado do arquivo já levantado nesta carga (sem reler a planilha para o hash)."""
+    if not PASTA_CACHE: return None
+    arq, arq_meta = _arquivos_cache(path, aba)
+    try:
+        with open(arq_meta, encoding="utf-8") as f: meta = json.load(f)
+        if meta.get("versao") != VERSAO_CACHE or meta.get("formato") != FORMATO_CACHE: return None
+        fp = (fp or fingerprint_arquivo(path)) if validar else meta.get("fp")
+        if fp is None: return None
+        if list(fp) != meta.get("fp"):
+            # mtime pode mudar sem o conteúdo mudar (cópia/sincronização): confere o hash
+            if not meta.get("hash") or (obter_hash or (lambda: hash_arquivo(path)))() != meta["hash"]: return None
+        df = pd.read_parquet(arq) if FORMATO_CACHE == "parquet" else pd.read_pickle(arq)
+        df["_Hora"] = df["_Hora"].where(df["_Hora"].notna(), None)
+        return df
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.error(f"ler_cache: {e}"); return None
+
+def gravar_cache(path: str, aba: str, df: pd.DataFrame, fp: Optional[Tuple[int, int]], hsh: Optional[str]):
+    if not PASTA_CACHE or fp is None or df.empty: return
+    arq, arq_meta = _arquivos_cache(path, aba)
+    try:
+        os.makedirs(PASTA_CACHE, exist_ok=True)
+        tmp = arq + ".tmp"
+        if FORMATO_CACHE == "parquet": df[COLS_CACHE].to_parquet(tmp, index=False)
+        else: df[COLS_CACHE].to_pickle(tmp)
+        os.replace(tmp, arq)
+        with open(arq_meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO_CACHE, "formato": FORMATO_CACHE, "fonte": os.path.abspath(path),
+                       "aba": aba, "fp": list(fp), "hash": hsh}, f)
+        os.replace(arq_meta + ".tmp", arq_meta)
+    except Exception as e:
+        logging.error(f"gravar_cache: {e}")
+
+def carregar_planilha(path: str, aba: str = ABA_EXCEL, origem: Optional[str] = None,
+                      fp: Optional[Tuple[int, int]] = None, hsh: Optional[str] = None) -> pd.DataFrame:
+    """Snapshot em disco se ainda bate com o arquivo; senão lê o Excel e regrava o cache.
+    fp/hsh: os que o monitor levantou ao marcar; o arquivo é lido para o hash no máximo uma vez."""
+    fp = fp or fingerprint_arquivo(path)          # antes de ler: se mudar durante a leitura, o cache não vale
+    estado = {"hash": hsh}
+    def obter_hash() -> Optional[str]:
+        if estado["hash"] is None and fp: estado["hash"] = hash_arquivo(path)
+        return estado["hash"]
+    with METRICAS.medir("cache_ms"):
+        df = ler_cache(path, aba, fp=fp, obter_hash=obter_hash)
+    if df is not None:
+        logging.info(f"Planilha carregada do cache ({len(df)} linhas)")
+        return df
+    with METRICAS.medir("parse_ms"):
+        df = ler_planilha(path, aba, origem)
+    gravar_cache(path, aba, df, fp, obter_hash() if PASTA_CACHE else None)
+    return df
+
+# ============================== Fontes (planilhas/abas) ==============================
+def fontes_configuradas() -> List[Dict]:
+    return [dict(caminho=f["caminho"], aba=f.get("aba", ABA_EXCEL), tag=f.get("tag", "")) for f in FONTES] \
+        or [dict(caminho=CAMINHO_EXCEL, aba=ABA_EXCEL, tag="")]
+
+class FontePlanilha:
+    """Uma planilha/aba configurada, com o próprio monitor (só ela é relida quando muda)
+    e a última leitura boa já normalizada e marcada com a tag (com BANCO_SQLITE, só até ir
+    para o banco: a fonte sabe que mudou pelo monitor, não guardando a planilha)."""
+    def __init__(self, caminho: str, aba: str = ABA_EXCEL, tag: str = ""):
+        self.caminho, self.aba, self.tag = caminho, aba, tag
+        if eh_url(caminho):
+            remota = FonteHTTP(caminho, PASTA_CACHE or "cache")
+            self.arquivo, self.monitor = remota.arquivo, MonitorHTTP(remota)   # lê a cópia local
+        else:
+            self.arquivo, self.monitor = caminho, MonitorArquivo(caminho, confirmar_hash=CONFIRMAR_HASH_PLANILHA)
+        self.df: Optional[pd.DataFrame] = None
+        self.suja = True   # relê na próxima carga
+        self.lendo = False
+        self.falhas = 0                 # leituras seguidas que falharam
+        self.retentar_em = 0.0          # perf_counter a partir do qual o vigiar relê uma fonte suja
+
+    @property
+    def nome(self) -> str:
+        return self.tag or f"{self.caminho} [{self.aba}]"
+
+    def rotular(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df[COLS_CACHE].assign(_Fonte=self.tag) if not df.empty else df
+
+_pool_leitura = None
+_fila_log_pool = None
+
+def pool_leitura():
+    global _pool_leitura, _fila_log_pool
+    if _pool_leitura is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn em todo SO (no Windows é o único): não herda threads do watchdog/laço de eventos
+        ctx = multiprocessing.get_context("spawn")
+        if _fila_log_pool is None: _fila_log_pool = fila_log_processos(ctx)
+        pids = ctx.SimpleQueue()   # cada leitor avisa o próprio pid ao subir
+        _pool_leitura = ProcessPoolExecutor(max_workers=max(1, min(len(FONTES), os.cpu_count() or 1)), mp_context=ctx,
+                                            initializer=_log_no_processo, initargs=(_fila_log_pool, pids))
+        _pool_leitura.pids = pids
+    return _pool_leitura
+
+def descartar_pool(pool, matar: bool = False):
+    """O próximo pool_leitura() cria outro. matar=True encerra os processos: um leitor travado
+    nunca devolveria a vaga e as próximas leituras ficariam na fila atrás dele.
+    O encerramento roda numa thread: o laço de eventos (relógio) não espera o pool."""
+    global _pool_leitura
+    if _pool_leitura is pool: _pool_leitura = None
+    def encerrar():
+        if matar:
+            while not pool.pids.empty():
+                try: os.kill(pool.pids.get(), signal.SIGTERM)   # no Windows, TerminateProcess
+                except OSError: pass                             # já tinha saído
+        pool.shutdown(wait=True, cancel_futures=True)
+    threading.Thread(target=encerrar, daemon=True).start()
+
+def _ler_em_processo(path: str, aba: str, origem: str, estado: Tuple, pasta_cache: Optional[str],
+                     motor_excel: str) -> pd.DataFrame:
+    # o processo novo só vê a config do arquivo; a do processo principal vem por parâmetro
+    global PASTA_CACHE, MOTOR_EXCEL
+    PASTA_CACHE, MOTOR_EXCEL = pasta_cache, motor_excel
+    return carregar_planilha(path, aba, origem, *estado)
+
+def em_thread(fn, *args) -> asyncio.Future:
+    """Como asyncio.to_thread, mas numa thread daemon: leitura travada (OneDrive/SMB) é abandonada
+    pelo timeout sem ocupar o executor padrão nem segurar a saída do app."""
+    loop = asyncio.get_running_loop(); futuro = loop.create_future()
+    def entregar(ok: bool, valor):
+        if futuro.done(): return   # já abandonada
+        if ok: futuro.set_result(valor)
+        else: futuro.set_exception(valor)
+    def rodar():
+        try: r = (True, fn(*args))
+        except BaseException as e: r = (False, e)
+        try: loop.call_soon_threadsafe(entregar, *r)
+        except RuntimeError: pass   # laço já fechado
+    threading.Thread(target=rodar, daemon=True).start()
+    return futuro
+
+async def ler_fonte(f: FontePlanilha, em_processo: bool) -> pd.DataFrame:
+    """Marca o monitor e lê a fonte: num processo do pool (várias fontes) ou numa thread daemon
+    (uma só: sem custo de processo). O prazo fica com quem chama (asyncio.wait_for)."""
+    from concurrent.futures.process import BrokenProcessPool
+    await em_thread(f.monitor.marcar)   # antes de ler; para URL, traz a cópia local em dia
+    estado = (getattr(f.monitor, "fp", None), getattr(f.monitor, "hash", None))   # fp/hash desta carga
+    if not em_processo: return await em_thread(carregar_planilha, f.arquivo, f.aba, f.nome, *estado)
+    for tentativa in range(2):
+        pool = pool_leitura()
+        try:
+            futuro = pool.submit(_ler_em_processo, f.arquivo, f.aba, f.nome, estado, PASTA_CACHE, MOTOR_EXCEL)
+            return await asyncio.wrap_future(futuro)
+        except BrokenProcessPool:
+            descartar_pool(pool)   # p.ex. reciclado por causa de outra fonte travada: tenta uma vez num novo
+            if tentativa: raise
+
+def juntar_fontes(partes: List[pd.DataFrame]) -> pd.DataFrame:
+    partes = [df for df in partes if df is not None and not df.empty]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+# ============================== Histórico SQLite (opcional) ==============================
+ESQUEMA_BANCO = """
+CREATE TABLE IF NOT EXISTS compromissos (
+    data TEXT NOT NULL, hora TEXT NOT NULL, nome TEXT NOT NULL, n INTEGER NOT NULL,
+    diretoria TEXT NOT NULL, gerencia TEXT NOT NULL,
+    ano INTEGER NOT NULL, semana INTEGER NOT NULL, dia INTEGER NOT NULL, fonte TEXT NOT NULL,
+    PRIMARY KEY (data, hora, nome, n, fonte)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_compromissos_semana ON compromissos (ano, semana, dia, hora);
+"""
+COLS_BANCO = "data, hora, nome, n, diretoria, gerencia, ano, semana, dia, fonte"
+
+class BancoCompromissos:
+    """Compromissos normalizados num SQLite local. Cada carga da planilha é mesclada por chave
+    (upsert); de cada fonte é conferido tudo a partir da semana mais antiga que ela cobre (ou da
+    semana de hoje, se for antes): semana que sumiu da planilha some daqui também. Só semanas já
+    passadas e anteriores às da planilha ficam como histórico."""
+    def __init__(self, caminho: str):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)   # carga em thread, leitura no laço
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.executescript(ESQUEMA_BANCO)
+            self.conn.executescript(f"""
+                CREATE TEMP TABLE IF NOT EXISTS novos AS SELECT {COLS_BANCO} FROM compromissos WHERE 0;
+                CREATE INDEX IF NOT EXISTS temp.ix_novos ON novos (data, hora, nome, n, fonte);""")
+
+    @staticmethod
+    def _linha(r: Compromisso, ano: int, semana: int, dia: int) -> Tuple:
+        hora = r.hora.strftime("%H:%M") if r.hora else ""   # "" = sem hora (PK não aceita NULL aqui)
+        return (r.data.isoformat(), hora, r.nome, r.chave[3], r.diretoria, r.gerencia, ano, semana, dia, r.fonte)
+
+    @staticmethod
+    def _compromisso(l: Tuple) -> Compromisso:
+        d = date.fromisoformat(l[0]); h = time.fromisoformat(l[1]) if l[1] else None
+        return Compromisso(d, h, l[2], l[4], l[5], l[9], (d, h, l[2], l[3], l[9]))
+
+    def sincronizar(self, indice: IndiceSemanas) -> Mudancas:
+        """Upsert da planilha já indexada; devolve o changeset aplicado."""
+        linhas = [self._linha(r, a, s, d) for (a, s), dias in indice.items() for d, regs in dias.items() for r in regs]
+        with self._lock, self.conn:
+            c = self.conn
+            c.execute("DELETE FROM novos")
+            c.executemany(f"INSERT INTO novos ({COLS_BANCO}) VALUES (?,?,?,?,?,?,?,?,?,?)", linhas)
+            novos = c.execute(f"""SELECT {COLS_BANCO} FROM novos n WHERE NOT EXISTS (
+                SELECT 1 FROM compromissos c WHERE (c.data, c.hora, c.nome, c.n, c.fonte) = (n.data, n.hora, n.nome, n.n, n.fonte))""").fetchall()
+            alterados = c.execute(f"""SELECT n.{COLS_BANCO.replace(', ', ', n.')} FROM novos n JOIN compromissos c
+                USING (data, hora, nome, n, fonte) WHERE (n.diretoria, n.gerencia) <> (c.diretoria, c.gerencia)""").fetchall()
+            removidos = []
+            hoje = date.today()
+            for fonte, primeira in c.execute("SELECT fonte, MIN(data) FROM novos GROUP BY fonte").fetchall():
+                d = min(date.fromisoformat(primeira), hoje); inicio = d - timedelta(days=d.weekday())   # segunda
+                removidos += c.execute(f"""SELECT {COLS_BANCO} FROM compromissos c WHERE c.fonte = ? AND c.data >= ?
+                    AND NOT EXISTS (SELECT 1 FROM novos n
+                    WHERE (n.data, n.hora, n.nome, n.n, n.fonte) = (c.data, c.hora, c.nome, c.n, c.fonte))""",
+                    (fonte, inicio.isoformat())).fetchall()
+            c.executemany("DELETE FROM compromissos WHERE data=? AND hora=? AND nome=? AND n=? AND fonte=?",
+                          [l[:4] + l[9:] for l in removidos])
+            c.execute(f"""INSERT INTO compromissos ({COLS_BANCO}) SELECT {COLS_BANCO} FROM novos WHERE true
+                ON CONFLICT (data, hora, nome, n, fonte) DO UPDATE SET diretoria = excluded.diretoria, gerencia = excluded.gerencia""")
+            c.execute("DELETE FROM novos")
+        return Mudancas([self._compromisso(l) for l in novos], [self._compromisso(l) for l in alterados],
+                        [self._compromisso(l) for l in removidos],
+                        {(l[6], l[7]) for l in novos + alterados + removidos})
+
+    def semanas(self) -> List[Tuple[int, int]]:
+        with self._lock:
+            return self.conn.execute("SELECT DISTINCT ano, semana FROM compromissos ORDER BY ano, semana").fetchall()
+
+    def semana(self, ano: int, semana: int) -> Dict[int, List[Compromisso]]:
+        # mesma ordem de indexar_semanas: sem hora por último, depois hora, nome, fonte e repetição
+        with self._lock:
+            linhas = self.conn.execute(f"""SELECT {COLS_BANCO} FROM compromissos WHERE ano = ? AND semana = ?
+                ORDER BY dia, hora = '', hora, nome, fonte, n""", (ano, semana)).fetchall()
+        dias = {i: [] for i in range(5)}
+        for l in linhas: dias[l[8]].append(self._compromisso(l))
+        return dias
+
+class IndiceSQLite:
+    """Lido como o dict de indexar_semanas (get, in, iteração em ordem), mas consultando o banco:
+    só as semanas pedidas viram objetos, num LRU pequeno; um novo a cada carga."""
+    CACHE_MAX = 16
+
+    def __init__(self, banco: BancoCompromissos):
+        self.banco = banco
+        self._semanas = [tuple(s) for s in banco.semanas()]
+        self._conjunto = set(self._semanas)
+        self._cache: OrderedDict = OrderedDict()
+
+    def get(self, semana: Tuple[int, int], padrao=None):
+        if semana not in self._conjunto: return padrao
+        dias = self._cache.get(semana)
+        if dias is None:
+            dias = self._cache[semana] = self.banco.semana(*semana)
+            if len(self._cache) > self.CACHE_MAX: self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(semana)
+        return dias
+
+    def __iter__(self): return iter(self._semanas)
+    def __contains__(self, semana): return semana in self._conjunto
+    def __len__(self): return len(self._semanas)
+
+# ============================== Exportação estática ==============================
+# cores Material da paleta() em CSS (ft.Colors são só nomes)
+CORES_CSS = {
+    "white": "#FFFFFF", "grey50": "#FAFAFA", "grey100": "#F5F5F5", "grey300": "#E0E0E0",
+    "grey600": "#757575", "grey700": "#616161", "grey900": "#212121",
+    "blue50": "#E3F2FD", "blue100": "#BBDEFB", "blue600": "#1E88E5",
+    "green50": "#E8F5E9", "green200": "#A5D6A7", "green700": "#388E3C",
+    "amber50": "#FFF8E1", "amber300": "#FFD54F", "amber900": "#FF6F00",
+    "red50": "#FFEBEE", "red300": "#E57373", "red900": "#B71C1C",
+}
+
+JS_EXPORTACAO = """
+function dd(n){return String(n).padStart(2,"0")}
+function tick(){
+  const agora=Date.now();
+  document.getElementById("relogio").textContent=new Date().toLocaleString("pt-BR",
+    {weekday:"short",day:"2-digit",month:"2-digit",hour:"2-digit",minute:"2-digit",second:"2-digit"});
+  for(const el of document.querySelectorAll("[data-alvo]")){
+    const r=Math.floor((+el.dataset.alvo-agora)/1000);
+    if(r<=0){el.textContent="Entrega encerrada";el.parentNode.classList.add("fim")}
+    else el.textContent="Tempo até entrega: "+dd(Math.floor(r/3600))+":"+dd(Math.floor(r%3600/60))+":"+dd(r%60);
+  }
+}
+tick();setInterval(tick,1000);
+"""
+
+def html_estatico(dados: Dict[int, List[Compromisso]], y: int, w: int, hoje: date, view: str) -> str:
+    """Página autocontida (CSS + contagem em JS) com a mesma paleta e escala da tela."""
+    P = {k: CORES_CSS.get(getattr(v, "value", v), "#000") for k, v in paleta().items()}
+    sz = make_sz(1.0)
+    esc = html.escape
+    seg, sex = monday_friday_from_iso(y, w)
+
+    def card(r: Compromisso, booster: float) -> str:
+        def szz(v): return sz(int(v * booster))
+        htxt = r.hora.strftime("%H:%M") if r.hora else "--:--"
+        chips = "".join(f'<span class="chip">{esc(c)}</span>' for c in (r.diretoria, r.gerencia, r.fonte) if str(c).strip())
+        rodape = ""
+        if r.data == hoje and r.hora:
+            alvo = datetime.combine(r.data, r.hora) + timedelta(hours=3, minutes=30)
+            rodape = (f'<div class="tempo" style="font-size:{szz(18)}px">'
+                      f'<span data-alvo="{int(alvo.timestamp() * 1000)}"></span></div>')
+        return (f'<div class="card"><div class="topo" style="font-size:{szz(22)}px"><b>{esc(abrevia_nome(r.nome))}</b>'
+                f'<span class="hora">{htxt}</span></div><div>{chips}</div>{rodape}</div>')
+
+    if view == "day":
+        idx = min(max((hoje - seg).days, 0), 4)
+        dia = seg + timedelta(days=idx)
+        rotulo = f"Hoje: {hoje.strftime('%d/%m/%Y')}  •  Sem {w:02d}/{y}"
+        colunas = [(PT_DIAS[idx], dia, dados.get(idx, []), 1.12)]
+    else:
+        rotulo = f"{seg.strftime('%d/%m/%Y')} – {sex.strftime('%d/%m/%Y')}  •  Sem {w:02d}/{y}"
+        colunas = [(PT_DIAS[i], seg + timedelta(days=i), dados.get(i, []), 1.0) for i in range(5)]
+    corpo = "".join(
+        f'<section class="dia{" hoje" if d == hoje else ""}"><header><b>{nd}</b><span>{d.strftime("%d/%m")}</span></header>'
+        + ("".join(card(r, booster) for r in regs) or '<div class="vazio">Sem compromissos</div>') + "</section>"
+        for nd, d, regs, booster in colunas)
+    css = f"""
+body{{margin:0;padding:16px;background:{P["BG"]};color:{P["TEXTO"]};font-family:system-ui,sans-serif}}
+h1{{margin:0;color:{P["PRIMARIA"]};font-size:{sz(40)}px}} .rotulo{{color:{P["TEXTO_SUAVE"]};font-size:{sz(18)}px}}
+#relogio{{float:right;font-size:{sz(22)}px;font-weight:600}}
+main{{display:flex;gap:{sz(10)}px;margin-top:{sz(12)}px;padding:{sz(12)}px;background:{P["SURFACE"]};
+ border:1px solid {P["BORDA"]};border-radius:{sz(16)}px}}
+.dia{{flex:1;min-width:0}} .dia header{{display:flex;justify-content:space-between;padding:{sz(10)}px;margin-bottom:{sz(10)}px;
+ font-size:{sz(20)}px;background:{P["HEADER_DIA_BG"]};border:1px solid {P["BORDA"]};border-radius:{sz(12)}px}}
+.dia.hoje header{{background:{P["HEADER_HOJE_BG"]};color:{P["PRIMARIA"]}}}
+.card{{background:{P["SURFACE"]};border:1px solid {P["BORDA"]};border-radius:{sz(14)}px;padding:{sz(12)}px;
+ margin-bottom:{sz(10)}px;box-shadow:0 1px 2px #0002}}
+.topo{{display:flex;justify-content:space-between}} .hora{{color:{P["TEXTO_SUAVE"]}}}
+.chip{{display:inline-block;margin:{sz(8)}px {sz(8)}px 0 0;padding:{sz(4)}px {sz(10)}px;font-size:{sz(16)}px;
+ color:{P["TEXTO_SUAVE"]};background:{CORES_CSS["grey100"]};border:1px solid {P["BORDA"]};border-radius:999px}}
+.tempo{{margin-top:{sz(10)}px;padding:{sz(10)}px;font-weight:600;color:{P["OK"]};background:{P["OK_BG"]};
+ border:1px solid {CORES_CSS["green200"]};border-radius:{sz(10)}px}}
+.tempo.fim{{color:{CORES_CSS["grey600"]}}} .vazio{{color:{P["TEXTO_SUAVE"]};padding:{sz(10)}px}}"""
+    return (f'<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+            f'<meta http-equiv="refresh" content="60"><title>Planner Semanal</title><style>{css}</style></head>'
+            f'<body><span id="relogio"></span><h1>Planner Semanal</h1><div class="rotulo">{esc(rotulo)}</div>'
+            f'<main>{corpo}</main><script>{JS_EXPORTACAO}</script></body></html>')
+
+def exportar_estatico(dados: Dict[int, List[Compromisso]], y: int, w: int, hoje: date, pasta: str):
+    # só regrava o arquivo cujo conteúdo mudou: a tela recarrega (meta refresh) e nada mais
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        for nome, view in (("semana.html", "week"), ("hoje.html", "day")):
+            conteudo = html_estatico(dados, y, w, hoje, view)
+            arq = os.path.join(pasta, nome)
+            try:
+                with open(arq, encoding="utf-8") as f:
+                    if f.read() == conteudo: continue
+            except FileNotFoundError: pass
+            with open(arq + ".tmp", "w", encoding="utf-8") as f: f.write(conteudo)
+            os.replace(arq + ".tmp", arq)
+            logging.info(f"Exportado: {arq}")
+    except Exception as e:
+        logging.error(f"exportar_estatico: {e}")
+
+# ============================== Serviço de dados (compartilhado) ==============================
+def abrevia_nome(nome: str, tam: int = 2) -> str:
+    p = str(nome).split()
+    return " ".join(p[:tam]) if p else nome
+
+try:
+    from flet.core.page import PageDisconnectedException
+except ImportError:
+    PageDisconnectedException = ()
+
+class ServicoDados:
+    """Um por processo: lê e monitora as planilhas, mantém o índice e o motor de alertas de hoje
+    e dá o ritmo dos quadros. Cada sessão (TV) só assina e desenha.
+
+    Sessão = dict de callbacks: quadro(agora), ao_carregar(), ao_mudancas(mudancas),
+    ao_status(carregando), ao_alerta(kind).
+    """
+    def __init__(self, config: List[Dict]):
+        self.config = config
+        self.fontes = [FontePlanilha(**c) for c in config]
+        self.indice: IndiceSemanas = {}        # dict em memória, ou IndiceSQLite com BANCO_SQLITE
+        self.banco: Optional[BancoCompromissos] = None
+        if BANCO_SQLITE:
+            try: self.banco = BancoCompromissos(BANCO_SQLITE)
+            except Exception as e: logging.error(f"BancoCompromissos: {e}")
+        self.versao = 0                        # sobe a cada carga (chave dos caches das sessões)
+        self.motor = MotorTimers()             # timers dos compromissos de hoje (independe do que está na tela)
+        self.timers: Dict[Tuple, Dict] = {}    # registro: chave do compromisso -> timer de hoje (warned/due persistem)
+        self.hoje: Optional[date] = None
+        self.alerts_warn: set = set()          # nomes em janela <=15min
+        self.alerts_due: set = set()           # nomes estourados
+        self.versao_alertas = 0
+        self.sessoes: List[Dict] = []
+        self._iniciado = False
+        self._juntando = asyncio.Lock()        # uma junção por vez: cada diferença parte do índice publicado
+        self._cargas: set = set()              # cargas em andamento lançadas pelo vigiar
+
+    # ---------- sessões ----------
+    def assinar(self, sessao: Dict, page):
+        self.sessoes.append(sessao)
+        if not self._iniciado:
+            self._iniciado = True
+            page.run_task(self.executar)
+        elif self.versao:
+            sessao["ao_carregar"]()            # dados já carregados: a TV nova monta na hora
+
+    def cancelar(self, sessao: Dict):
+        if sessao in self.sessoes: self.sessoes.remove(sessao)
+
+    def _avisar(self, evento: str, *args):
+        for s in list(self.sessoes):
+            try:
+                s[evento](*args)
+            except PageDisconnectedException:
+                self.cancelar(s)
+            except Exception as e:
+                logging.error(f"ServicoDados.{evento}: {e}")
+
+    # ---------- carga ----------
+    @property
+    def carregando(self) -> bool:
+        return any(f.lendo for f in self.fontes)
+
+    def _montar_indice(self) -> Tuple[IndiceSemanas, Optional[Mudancas]]:
+        # roda numa thread: junção + índice + diferença, sem tocar em controles
+        with METRICAS.medir("carga_ms"):
+            lidas = [(f, f.df) for f in self.fontes if f.df is not None]
+            df = juntar_fontes([d for _, d in lidas])
+            with METRICAS.medir("indice_ms"):
+                indice = indexar_semanas(df)
+            if self.banco is None:
+                return indice, (diferenca_indices(self.indice, indice) if self.indice and indice else None)
+            # com banco: cada fonte lida vai para o banco (que só confere as fontes presentes) e o
+            # DataFrame dela é solto; planilha ilegível não apaga o histórico; o índice residente
+            # é só o do banco (semana pedida vira objeto, o resto fica no disco)
+            with METRICAS.medir("banco_ms"):
+                mudancas = self.banco.sincronizar(indice) if indice else Mudancas([], [], [], set())
+                indice = IndiceSQLite(self.banco)
+            for f, d in lidas:
+                if f.df is d: f.df = None   # uma leitura que chegou durante a junção fica para a próxima
+        return indice, (mudancas if self.indice and indice else None)
+
+    @staticmethod
+    def _falhou(f: FontePlanilha, motivo: str) -> bool:
+        # o monitor já marcou o arquivo como lido: sem isto o vigiar nunca mais a relê
+        f.suja = True; f.falhas += 1
+        espera = min(RETENTATIVA_FONTE_MAX, 5 * 2 ** (f.falhas - 1))
+        f.retentar_em = perf_counter() + espera
+        logging.error(f"Fonte {f.nome}: {motivo} (mantendo a leitura anterior; nova tentativa em {espera}s)")
+        return False
+
+    async def _ler_fonte(self, f: FontePlanilha) -> bool:
+        """True se a fonte trouxe leitura nova. Erro, leitura vazia (ler_planilha engole o erro:
+        arquivo travado pelo OneDrive, truncado...) ou prazo estourado mantêm a anterior, e a
+        fonte fica suja para o vigiar repetir a leitura com espera crescente."""
+        em_processo = len(self.fontes) > 1
+        try:
+            df = await asyncio.wait_for(ler_fonte(f, em_processo), TEMPO_MAX_FONTE)
+        except asyncio.TimeoutError:
+            if em_processo and _pool_leitura is not None: descartar_pool(_pool_leitura, matar=True)
+            return self._falhou(f, f"passou de {TEMPO_MAX_FONTE}s")
+        except Exception as e:
+            return self._falhou(f, f"{type(e).__name__} {e}")
+        finally:
+            f.lendo = False
+        if df.empty: return self._falhou(f, "leitura vazia")
+        f.suja = False; f.falhas = 0
+        f.df = f.rotular(df)
+        return True
+
+    async def _juntar_e_publicar(self):
+        async with self._juntando:
+            try:
+                indice, mudancas = await asyncio.to_thread(self._montar_indice)
+            except Exception as e:
+                logging.error(f"ServicoDados.carregar: {e}")
+                indice, mudancas = {}, None
+            if mudancas is not None:
+                logging.info(f"Recarga: +{len(mudancas.novos)} ~{len(mudancas.alterados)} -{len(mudancas.removidos)} "
+                             f"em {len(mudancas.semanas)} semana(s)")
+            self._publicar(indice, mudancas)
+
+    async def carregar(self):
+        # cada fonte suja é lida com prazo próprio e publicada assim que chega; as lentas não
+        # seguram as outras (seguem com a leitura anterior até terminarem)
+        sujas = [f for f in self.fontes if f.suja and not f.lendo]
+        if not sujas: return
+        for f in sujas: f.lendo = True
+        self._avisar("ao_status", True)
+        pendentes = {asyncio.ensure_future(self._ler_fonte(f)) for f in sujas}
+        while pendentes:
+            prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            # sem nada publicado ainda, a última publica mesmo sem dados (tela de erro)
+            if any(t.result() for t in prontas) or (not self.versao and not pendentes):
+                await self._juntar_e_publicar()
+        if not self.carregando: self._avisar("ao_status", False)
+        marcar_partida("completa")
+
+    def _lancar_carga(self):
+        tarefa = asyncio.ensure_future(self.carregar())
+        self._cargas.add(tarefa); tarefa.add_done_callback(self._cargas.discard)
+
+    def _publicar(self, indice: IndiceSemanas, mudancas: Optional[Mudancas]):
+        self.indice = indice   # troca já no laço de eventos
+        if mudancas is None:
+            # primeira carga, ou a planilha passou a/deixou de ser lida: monta tudo
+            self.versao += 1
+            self.montar_timers(datetime.now())
+            self._avisar("ao_carregar")
+            if indice: marcar_partida("semana_atual")
+            self.agendar_exportacao()
+        elif mudancas.semanas:
+            self.aplicar_mudancas(mudancas)
+            self._avisar("ao_mudancas", mudancas)
+            if semana_iso_de(date.today()) in mudancas.semanas: self.agendar_exportacao()
+
+    def agendar_exportacao(self):
+        # semana de hoje lida aqui (no laço); HTML e disco ficam numa thread
+        if not PASTA_EXPORTACAO or not self.indice: return
+        hoje = date.today()
+        y, w = semana_iso_de(hoje)
+        dados = self.indice.get((y, w)) or {}
+        asyncio.get_running_loop().run_in_executor(None, exportar_estatico, dados, y, w, hoje, PASTA_EXPORTACAO)
+
+    async def partida_rapida(self):
+        # antes da carga completa: último snapshot (ou histórico do banco), mesmo desatualizado,
+        # começando pela semana de hoje; a planilha de verdade chega depois como recarga parcial
+        try:
+            if self.banco is not None:
+                indice = await asyncio.to_thread(IndiceSQLite, self.banco)
+                if indice: self._publicar(indice, None)
+                return
+            def snapshots():
+                partes = [f.rotular(df) for f in self.fontes
+                          if (df := ler_cache(f.arquivo, f.aba, validar=False)) is not None]
+                return pd.concat(partes, ignore_index=True) if partes else None
+            df = await asyncio.to_thread(snapshots)
+            if df is None or df.empty: return
+            y, w = semana_iso_de(date.today())
+            atual = await asyncio.to_thread(
+                lambda: indexar_semanas(df[(df["_AnoISO"] == y) & (df["_SemanaISO"] == w)]))
+            if atual: self._publicar(atual, None)
+            completo = await asyncio.to_thread(indexar_semanas, df)
+            self._publicar(completo, diferenca_indices(atual, completo) if atual else None)
+        except Exception as e:
+            logging.error(f"ServicoDados.partida_rapida: {e}")
+
+    async def vigiar(self):
+        # partida rápida + carga inicial; depois recarrega só quando o arquivo mudou de fato (stat estável + hash)
+        await self.partida_rapida()
+        self._lancar_carga()
+        while True:
+            await asyncio.sleep(INTERVALO_VERIFICA_PLANILHA)
+            # cada fonte tem o próprio fingerprint: só as que mudaram são relidas, e uma fonte
+            # ainda sendo lida não impede de ver as outras
+            mudaram = await asyncio.to_thread(lambda: [f for f in self.fontes if not f.lendo and f.monitor.mudou()])
+            if mudaram:
+                for f in mudaram: f.suja = True; f.retentar_em = 0.0
+                logging.info(f"Planilha alterada, recarregando: {', '.join(f.nome for f in mudaram)}")
+                self._lancar_carga()
+            elif any(f.suja and not f.lendo and perf_counter() >= f.retentar_em for f in self.fontes):
+                self._lancar_carga()   # leitura que falhou: tenta de novo mesmo sem o arquivo mudar
+
+    # ---------- timers / alertas ----------
+    def _registrar_timer(self, r: Compromisso):
+        if r.hora is None or r.data != self.hoje: return
+        timer = {"chave": r.chave, "alvo": datetime.combine(r.data, r.hora) + timedelta(hours=3, minutes=30),
+                 "nome": abrevia_nome(r.nome), "warned": False, "due": False}
+        self.timers[r.chave] = timer
+        self.motor.registrar(timer)
+
+    def montar_timers(self, agora: datetime):
+        # sincroniza o registro com os compromissos de hoje: quem continua na planilha mantém
+        # warned/due (recarga completa não repete som); só um dia novo zera tudo
+        if agora.date() != self.hoje:
+            self.hoje = agora.date()
+            self.motor.limpar(); self.timers.clear()
+        registros = []
+        if self.hoje.weekday() <= 4:
+            y, w = semana_iso_de(self.hoje)
+            registros = (self.indice.get((y, w)) or {}).get(self.hoje.weekday(), [])
+        chaves = {r.chave for r in registros}
+        for chave in [c for c in self.timers if c not in chaves]:
+            self.motor.remover(self.timers.pop(chave))
+        for r in registros:
+            if r.chave not in self.timers: self._registrar_timer(r)
+        self._recalcular_alertas()
+
+    def aplicar_mudancas(self, mudancas: Mudancas):
+        # só os timers de hoje que entraram/saíram; os demais seguem com o estado que tinham
+        # (alterados mantêm a chave => mesmo horário e nome => mesmo timer)
+        removidos = [self.timers.pop(r.chave) for r in mudancas.removidos if r.chave in self.timers]
+        for timer in removidos: self.motor.remover(timer)
+        for r in mudancas.novos: self._registrar_timer(r)
+        if any(t["warned"] or t["due"] for t in removidos): self._recalcular_alertas()
+
+    def _recalcular_alertas(self):
+        self.alerts_warn = {t["nome"] for t in self.timers.values() if t["warned"]}
+        self.alerts_due = {t["nome"] for t in self.timers.values() if t["due"]}
+        self.versao_alertas += 1
+
+    def processar_prazos(self, agora: datetime):
+        # transições saem do heap no horário exato; cada TV toca o próprio som.
+        # warned/due ficam no registro: cada compromisso avisa uma vez por dia
+        for kind, item in self.motor.vencidos(agora):
+            nome = item["nome"]
+            if kind == "warn":
+                # --- estado warn (<=15min) ---
+                if not item["warned"]:
+                    item["warned"] = True
+                    self.alerts_warn.add(nome); self.versao_alertas += 1
+                    self._avisar("ao_alerta", "warn")
+            elif not item["due"]:
+                # --- estado due ---
+                item["due"] = True
+                self.alerts_due.add(nome); self.versao_alertas += 1
+                self._avisar("ao_alerta", "due")
+
+    # ---------- laço de quadros ----------
+    async def quadros(self):
+        # um único laço para o processo: no máximo um page.update() por sessão por quadro,
+        # alinhado às viradas de segundo do relógio
+        periodo = 1.0 / QUADROS_POR_SEGUNDO_MAX
+        proximo = 0.0
+        while True:
+            agora = datetime.now()
+            t0 = perf_counter()
+            if agora.date() != self.hoje:   # virou o dia
+                virada = self.hoje is not None
+                self.montar_timers(agora); self.agendar_exportacao()
+                # sem edição da planilha de madrugada: as TVs vão para a semana de hoje e
+                # redesenham o destaque e as contagens do dia novo
+                if virada and self.versao: self._avisar("ao_carregar")
+            self.processar_prazos(agora)
+            ts = agora.timestamp()
+            if ts >= proximo:
+                self._avisar("quadro", agora)
+                proximo = (math.floor(ts / periodo) + 1) * periodo
+                METRICAS.registrar("quadro_ms", (perf_counter() - t0) * 1000)
+
+            # acorda logo após a próxima virada de quadro, ou antes se um prazo vencer
+            acordar = proximo + 0.005
+            prox = self.motor.proximo_prazo()
+            if prox is not None:
+                acordar = min(acordar, prox.timestamp())
+            await asyncio.sleep(max(0.0, acordar - datetime.now().timestamp()))
+
+    async def executar(self):
+        await asyncio.gather(self.vigiar(), self.quadros())
+
+_servico: Optional[ServicoDados] = None
+
+def obter_servico() -> ServicoDados:
+    global _servico
+    config = fontes_configuradas()
+    if _servico is None or _servico.config != config:
+        _servico = ServicoDados(config)
+    return _servico
+
 # ============================== App ==============================
 PT_DIAS = ["Segunda","Terça","Quarta","Quinta","Sexta"]
 
 def main(page: ft.Page):
+    marcar_partida("imports")
     # janela
     page.window_full_screen = MODO_TV
     page.window_maximized = True
@@ -153,59 +1504,44 @@ def main(page: ft.Page):
     audio_due  = ft.Audio(src="alert_due.mp3",  autoplay=False, volume=1.0)  # estourou
     page.overlay.extend([audio_warn, audio_due])
 
-    # estado (inclui timers e alertas)
+    # dados, índice, timers e alertas vêm do serviço compartilhado; aqui só o estado da tela
+    servico = obter_servico()
     state = {
-        "df": pd.DataFrame(), "y": None, "w": None, "view": "week",
-        "timers": [],                  # cada item: {"ctrl":Text, "alvo":datetime, "nome":str, "warned":bool, "due":bool}
-        "alerts_warn": set(),          # nomes em janela <=15min
-        "alerts_due": set(),           # nomes estourados
+        "y": None, "w": None, "view": "week",
+        "timers_tela": [],             # contagens visíveis: {"ctrl":Text, "alvo":datetime}
+        "versao_alertas": -1,          # última versão dos alertas do serviço desenhada no painel
     }
 
     # ---------- helpers dados ----------
-    def dados_semana(df: pd.DataFrame, y: int, w: int) -> Dict[int, List[Dict]]:
-        seg, sex = monday_friday_from_iso(y, w)
-        mask = (df["_Data"] >= seg) & (df["_Data"] <= sex)
-        sem = df.loc[mask].copy()
-        por = {i: [] for i in range(5)}
-        for _, r in sem.iterrows():
-            i = r["_Data"].weekday()
-            if i <= 4: por[i].append(r.to_dict())
-        for k in por:
-            por[k].sort(key=lambda r: (r.get("_Hora") is None, r.get("_Hora") or time(23,59), r.get("_Nome") or ""))
-        return por
+    def dados_semana(indice: IndiceSemanas, y: int, w: int) -> Dict[int, List[Compromisso]]:
+        return indice.get((y, w)) or {i: [] for i in range(5)}
 
     # ---------- UI atoms ----------
-    def chip(texto: str) -> ft.Container:
+    def chip(texto: str, icone=ft.Icons.LABEL_OUTLINED) -> ft.Container:
         if not str(texto).strip(): return ft.Container()
         return ft.Container(
             content=ft.Row(
-                [ft.Icon(ft.Icons.LABEL_OUTLINED, size=sz(16), color=P["TEXTO_SUAVE"]),
+                [ft.Icon(icone, size=sz(16), color=P["TEXTO_SUAVE"]),
                  ft.Text(str(texto), size=sz(16), color=P["TEXTO_SUAVE"])],
                 spacing=sz(6), tight=True),
             bgcolor=ft.Colors.GREY_100, border=ft.border.all(1, P["BORDA"]),
             border_radius=999, padding=ft.Padding(sz(10), sz(6), sz(10), sz(6))
         )
 
-    def abrevia_nome(nome: str, tam: int = 2) -> str:
-        p = str(nome).split()
-        return " ".join(p[:tam]) if p else nome
-
-    def card_compromisso(reg: Dict, hoje: date, booster: float = 1.0) -> ft.Card:
+    def card_compromisso(reg: Compromisso, hoje: date, booster: float = 1.0) -> ft.Card:
         def szz(v): return sz(int(v * booster))
-        nome = abrevia_nome(reg.get("_Nome",""))
-        d = reg.get("_Data"); h = reg.get("_Hora")
-        diret = reg.get("_Diretoria",""); ger = reg.get("_Gerencia","")
+        nome = abrevia_nome(reg.nome)
+        d, h, diret, ger = reg.data, reg.hora, reg.diretoria, reg.gerencia
         htxt = h.strftime("%H:%M") if isinstance(h, time) else "--:--"
 
-        # rodapé com timer + registro para alertas
+        # rodapé com a contagem (alertas/sons ficam no motor do serviço)
         rodape = ft.Container()
+        timer = None   # o render registra em state["timers_tela"]
         if isinstance(d, date) and d == hoje and isinstance(h, time):
             inicial = str(calcular_temporizador(h, d)).split(".")[0]
             tempo_ctrl = ft.Text(f"Tempo até entrega: {inicial}",
                                  size=szz(18), color=P["OK"], weight=ft.FontWeight.W_600)
-            alvo = datetime.combine(d, h) + timedelta(hours=3, minutes=30)
-            # registra também o nome e flags de alerta
-            state["timers"].append({"ctrl": tempo_ctrl, "alvo": alvo, "nome": nome, "warned": False, "due": False})
+            timer = {"ctrl": tempo_ctrl, "alvo": datetime.combine(d, h) + timedelta(hours=3, minutes=30)}
 
             rodape = ft.Container(
                 bgcolor=P["OK_BG"],
@@ -229,50 +1565,112 @@ def main(page: ft.Page):
         )
 
         return ft.Card(
+            data=timer,
             elevation=1, surface_tint_color=P["SURFACE"], margin=ft.margin.only(bottom=szz(10)),
             content=ft.Container(
                 bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]),
                 border_radius=szz(14), padding=szz(12),
                 content=ft.Column(
-                    [head, ft.Row([chip(diret), chip(ger)], spacing=szz(8)), rodape],
+                    [head, ft.Row([chip(diret), chip(ger), chip(reg.fonte, ft.Icons.SOURCE_OUTLINED)], spacing=szz(8)),
+                     rodape],
                     spacing=szz(10), tight=True)
             )
         )
 
-    def coluna_dia(titulo: str, data_dia: date, registros: List[Dict], destaque_hoje: bool, altura_scroll: int) -> ft.Container:
-        header_bg = P["HEADER_HOJE_BG"] if destaque_hoje else P["HEADER_DIA_BG"]
-        header_text = P["PRIMARIA"] if destaque_hoje else P["TEXTO"]
-
-        cards = [card_compromisso(r, hoje=datetime.now().date()) for r in registros] or [
-            ft.Container(
-                padding=sz(12),
-                content=ft.Row(
-                    [ft.Icon(ft.Icons.INBOX, size=sz(20), color=P["TEXTO_SUAVE"]),
-                     ft.Text("Sem compromissos", size=sz(18), color=P["TEXTO_SUAVE"])],
-                    spacing=sz(8)))
-        ]
-
+    # ---------- reconciliação: cards reaproveitados por chave (data + hora + nome) ----------
+    cards_vivos: Dict[Tuple, Tuple[Tuple, ft.Card]] = {}   # chave -> (assinatura, card) do último render
+
+    # listas virtualizadas: só os primeiros cards (uma tela + folga) viram controles;
+    # o resto entra em blocos quando a rolagem chega perto do fim (alertas valem para todos: serviço)
+    JANELA_CARDS = 12
+    BLOCO_CARDS = 12
+
+    def nova_lista_cards(spacing: int) -> Dict:
+        lista = {"registros": [], "chaves": [], "dia": None, "hoje": None, "booster": 1.0,
+                 "janela": JANELA_CARDS}
+        lista["view"] = ft.ListView(spacing=spacing, expand=True, build_controls_on_demand=True,
+                                    on_scroll_interval=100, on_scroll=lambda e: ao_rolar_lista(lista, e))
+        return lista
+
+    def obter_card(r: Compromisso, chave: Tuple, hoje: date, booster: float, usados: Dict) -> ft.Card:
+        assinatura = (r.diretoria, r.gerencia, r.data == hoje)
+        atual = cards_vivos.get(chave)
+        if atual is None or atual[0] != assinatura:
+            atual = (assinatura, card_compromisso(r, hoje=hoje, booster=booster))
+        usados[chave] = atual
+        return atual[1]
+
+    def chaves_registros(registros: List[Compromisso], booster: float) -> List[Tuple]:
+        return [(r.chave, booster) for r in registros]
+
+    def reconciliar_cards(lista: Dict, dia: date, registros: List[Compromisso], hoje: date, booster: float,
+                          vazio: ft.Control, usados: Dict[Tuple, Tuple[Tuple, ft.Card]]):
+        if lista["dia"] != dia: lista["janela"] = JANELA_CARDS   # outro dia: volta ao topo
+        chaves = chaves_registros(registros, booster)
+        lista.update(dia=dia, registros=registros, hoje=hoje, booster=booster, chaves=chaves)
+        novos = []
+        for r, chave in zip(registros[:lista["janela"]], chaves):
+            card = obter_card(r, chave, hoje, booster, usados)
+            if card.data: state["timers_tela"].append(card.data)
+            novos.append(card)
+        novos = novos or [vazio]
+        # mesma sequência de controles => o diff do Flet não manda nada para esta lista
+        view = lista["view"]
+        if len(novos) != len(view.controls) or any(a is not b for a, b in zip(novos, view.controls)):
+            view.controls = novos
+
+    def expandir_lista(lista: Dict):
+        ini = lista["janela"]
+        fim = min(ini + BLOCO_CARDS, len(lista["registros"]))
+        for i in range(ini, fim):
+            chave = lista["chaves"][i]
+            card = obter_card(lista["registros"][i], chave, lista["hoje"], lista["booster"], cards_vivos)
+            if card.data: state["timers_tela"].append(card.data)
+            lista["view"].controls.append(card)
+        lista["janela"] = max(fim, ini)
+
+    def ao_rolar_lista(lista: Dict, e):
+        if e.pixels is None or e.max_scroll_extent is None: return
+        if lista["janela"] < len(lista["registros"]) and e.pixels >= e.max_scroll_extent - sz(400):
+            expandir_lista(lista)
+            page.update()
+
+    def montar_coluna_dia() -> Dict[str, ft.Control]:
+        # estrutura fixa; o render só troca textos/cores e reconcilia os cards
+        titulo = ft.Text("", size=sz(22), weight=ft.FontWeight.W_700)
+        data_txt = ft.Text("", size=sz(18), color=P["TEXTO_SUAVE"])
         header = ft.Container(
-            bgcolor=header_bg, border=ft.border.all(1, P["BORDA"]),
+            border=ft.border.all(1, P["BORDA"]),
             border_radius=sz(12), padding=sz(10),
-            content=ft.Row(
-                [ft.Text(titulo, size=sz(22), weight=ft.FontWeight.W_700, color=header_text),
-                 ft.Container(expand=True),
-                 ft.Text(data_dia.strftime("%d/%m"), size=sz(18), color=P["TEXTO_SUAVE"])],
-                alignment=ft.MainAxisAlignment.START),
+            content=ft.Row([titulo, ft.Container(expand=True), data_txt], alignment=ft.MainAxisAlignment.START),
             height=sz(52)
         )
-
-        corpo = ft.Container(
-            height=altura_scroll,
-            content=ft.Column(controls=cards, spacing=sz(10), scroll=ft.ScrollMode.ALWAYS, expand=True)
+        cards = nova_lista_cards(sz(10))
+        corpo = ft.Container(content=cards["view"])
+        vazio = ft.Container(
+            padding=sz(12),
+            content=ft.Row(
+                [ft.Icon(ft.Icons.INBOX, size=sz(20), color=P["TEXTO_SUAVE"]),
+                 ft.Text("Sem compromissos", size=sz(18), color=P["TEXTO_SUAVE"])],
+                spacing=sz(8)))
+        raiz = ft.Container(
+            expand=True, width=0,
+            content=ft.Container(
+                padding=ft.Padding(sz(8), 0, sz(8), 0),
+                width=0,
+                content=ft.Column(controls=[header, ft.Container(height=sz(10)), corpo], spacing=sz(10), expand=True)
+            )
         )
+        return dict(raiz=raiz, header=header, titulo=titulo, data=data_txt, corpo=corpo, cards=cards, vazio=vazio)
 
-        return ft.Container(
-            padding=ft.Padding(sz(8), 0, sz(8), 0),
-            width=0,
-            content=ft.Column(controls=[header, ft.Container(height=sz(10)), corpo], spacing=sz(10), expand=True)
-        )
+    def coluna_dia(col: Dict[str, ft.Control], titulo: str, data_dia: date, registros: List[Compromisso],
+                   destaque_hoje: bool, altura_scroll: int, usados: Dict):
+        col["header"].bgcolor = P["HEADER_HOJE_BG"] if destaque_hoje else P["HEADER_DIA_BG"]
+        col["titulo"].value = titulo
+        col["titulo"].color = P["PRIMARIA"] if destaque_hoje else P["TEXTO"]
+        col["data"].value = data_dia.strftime("%d/%m")
+        col["corpo"].height = altura_scroll
+        reconciliar_cards(col["cards"], data_dia, registros, datetime.now().date(), 1.0, col["vazio"], usados)
 
     # ======= UI Topo + controles =======
     titulo = ft.Text("Planner Semanal", size=sz(48 if MODO_TV else 32),
@@ -315,6 +1713,12 @@ def main(page: ft.Page):
 
     dd_semana = ft.Dropdown(label="Semana (ISO)", width=sz(420), visible=SHOW_DROPDOWN, border_color=P["BORDA"])
 
+    # indicador de carga da planilha (a leitura roda fora do laço de eventos)
+    indicador_carga = ft.Row(
+        [ft.ProgressRing(width=sz(18), height=sz(18), stroke_width=2, color=P["PRIMARIA"]),
+         ft.Text("Atualizando planilha…", size=sz(16), color=P["TEXTO_SUAVE"])],
+        spacing=sz(8), visible=False)
+
     header = ft.Container(
         bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]),
         border_radius=sz(16), padding=sz(12),
@@ -322,6 +1726,8 @@ def main(page: ft.Page):
             [
                 ft.Row([ft.Icon(ft.Icons.CALENDAR_MONTH, color=P["PRIMARIA"], size=sz(32)), titulo], spacing=sz(10)),
                 ft.Container(expand=True),
+                indicador_carga,
+                ft.Container(width=sz(10)),
                 ft.Row([btn_prev, btn_pick, btn_next], spacing=sz(6)),
                 ft.Container(width=sz(10)),
                 ft.Row([ft.Icon(ft.Icons.SCHEDULE, color=P["TEXTO_SUAVE"], size=sz(22)), relogio_txt], spacing=sz(8)),
@@ -357,6 +1763,50 @@ def main(page: ft.Page):
 
     grid_container = ft.Container(expand=True)
 
+    # grades fixas das duas visões (montadas uma vez; os renders só atualizam)
+    colunas_semana = [montar_coluna_dia() for _ in PT_DIAS]
+    grade_semana = ft.Container(
+        padding=sz(12), bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]), border_radius=sz(16),
+        content=ft.Row([c["raiz"] for c in colunas_semana], spacing=sz(10),
+                       alignment=ft.MainAxisAlignment.SPACE_BETWEEN, tight=True)
+    )
+
+    hoje_titulo = ft.Text("", size=sz(30), weight=ft.FontWeight.W_800, color=P["PRIMARIA"])
+    hoje_data = ft.Text("", size=sz(22), color=P["TEXTO_SUAVE"])
+    hoje_cards = nova_lista_cards(sz(12))
+    hoje_corpo = ft.Container(content=hoje_cards["view"])
+    hoje_vazio = ft.Container(
+        padding=sz(12),
+        content=ft.Row(
+            [ft.Icon(ft.Icons.INBOX, size=sz(22), color=P["TEXTO_SUAVE"]),
+             ft.Text("Sem compromissos para hoje.", size=sz(20), color=P["TEXTO_SUAVE"])],
+            spacing=sz(10)))
+    badge_hoje = ft.Container(
+        bgcolor=P["HOJE_BADGE_BG"], border_radius=sz(999),
+        padding=ft.Padding(sz(10), sz(6), sz(10), sz(6)),
+        content=ft.Row(
+            [ft.Icon(ft.Icons.TODAY, size=sz(18), color=P["PRIMARIA"]),
+             ft.Text("Destaque do Dia", size=sz(16), weight=ft.FontWeight.W_600, color=P["PRIMARIA"])],
+            spacing=sz(6), tight=True
+        )
+    )
+    grade_hoje = ft.Container(
+        padding=sz(12), bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]), border_radius=sz(16),
+        content=ft.Container(
+            padding=sz(12),
+            content=ft.Column(
+                [
+                    ft.Row([hoje_titulo, ft.Container(width=sz(10)), badge_hoje,
+                            ft.Container(expand=True), hoje_data], spacing=sz(8)),
+                    ft.Container(height=sz(12)),
+                    hoje_corpo
+                ],
+                spacing=sz(8),
+                expand=True
+            )
+        )
+    )
+
     # ---------- seleção de semana ----------
     def set_week(y: int, w: int):
         state["y"], state["w"] = y, w
@@ -388,11 +1838,34 @@ def main(page: ft.Page):
     date_picker.on_change = on_date_change
 
     # atalhos
+    # painel de depuração (tecla D): tempos das métricas, atualizado a cada quadro
+    debug_txt = ft.Text("", size=sz(14), color=ft.Colors.WHITE, font_family="monospace")
+    painel_debug = ft.Container(
+        visible=False, right=sz(16), bottom=sz(16), padding=sz(10), border_radius=sz(10),
+        bgcolor=ft.Colors.with_opacity(0.85, ft.Colors.BLACK), content=debug_txt
+    )
+    page.overlay.append(painel_debug)
+
+    def atualizar_painel_debug():
+        if not painel_debug.visible: return
+        linhas = []
+        for nome, r in METRICAS.resumo().items():
+            if "p50" in r:
+                linhas.append(f"{nome:<16} últ {r['ultimo']:>9.2f}  p50 {r['p50']:>9.2f}  p95 {r['p95']:>9.2f}  n {r['n']}")
+        debug_txt.value = "\n".join(linhas) or "sem amostras"
+        marcar_sujo()
+
+    def alternar_debug():
+        painel_debug.visible = not painel_debug.visible
+        atualizar_painel_debug()
+        page.update()
+
     def on_key(e: ft.KeyboardEvent):
         if e.key == "Arrow Left": offset_week(-1)
         elif e.key == "Arrow Right": offset_week(+1)
         elif e.key in ("W","w"): set_view("week")
         elif e.key in ("H","h"): set_view("day")
+        elif e.key in ("D","d"): alternar_debug()
     page.on_keyboard_event = on_key
 
     # ---------- helpers de alertas ----------
@@ -413,10 +1886,10 @@ def main(page: ft.Page):
         )
 
     def update_alerts_panel():
-        # monta painel com base em state["alerts_warn"] e ["alerts_due"]
+        # monta painel com base nos alertas do serviço (alerts_warn e alerts_due)
         alerts_panel_col.controls.clear()
-        warn_list = sorted(state["alerts_warn"])
-        due_list  = sorted(state["alerts_due"])
+        warn_list = sorted(servico.alerts_warn)
+        due_list  = sorted(servico.alerts_due)
         if warn_list:
             alerts_panel_col.controls.append(build_alert_badge("warn", warn_list))
         if due_list:
@@ -424,112 +1897,131 @@ def main(page: ft.Page):
         alerts_panel.visible = bool(warn_list or due_list)
 
     # ---------- Renders ----------
-    def render_semana(y: int, w: int, df: pd.DataFrame):
-        # limpa timers e painéis
-        state["timers"].clear()
-        state["alerts_warn"].clear()
-        state["alerts_due"].clear()
-        update_alerts_panel()
+    def indice_dia_destaque(seg: date, hoje: date) -> int:
+        return min(max((hoje - seg).days, 0), 4)
+
+    def dias_visiveis(y: int, w: int, view: str) -> List[Tuple[date, List[Compromisso], float]]:
+        # (dia, registros, booster) de cada lista que o render da visão monta
+        seg, _ = monday_friday_from_iso(y, w)
+        dados = dados_semana(servico.indice, y, w)
+        if view == "day":
+            idx = indice_dia_destaque(seg, datetime.now().date())
+            return [(seg + timedelta(days=idx), dados.get(idx, []), 1.12)]
+        return [(seg + timedelta(days=i), dados.get(i, []), 1.0) for i in range(5)]
+
+    # alturas dos containers com rolagem: calculadas uma vez por tamanho de janela
+    layout = {"altura_total": None, "semana": 0, "hoje": 0}
+
+    def alturas_scroll() -> Dict:
+        altura_total = page.height or 1080
+        if layout["altura_total"] != altura_total:
+            layout.update(altura_total=altura_total,
+                          semana=max(sz(360), int(altura_total - sz(380))),  # reserva header + alerts + viewbar
+                          hoje=max(sz(480), int(altura_total - sz(340))))
+        return layout
+
+    def aplicar_alturas() -> bool:
+        alt = alturas_scroll()
+        mudou = False
+        for corpo, altura in [(c["corpo"], alt["semana"]) for c in colunas_semana] + [(hoje_corpo, alt["hoje"])]:
+            if corpo.height != altura:
+                corpo.height = altura; mudou = True
+        return mudou
+
+    def render_semana(y: int, w: int, indice: IndiceSemanas):
+        # contagens voltam a ser registradas pelos cards desta tela
+        state["timers_tela"].clear()
 
         seg, sex = monday_friday_from_iso(y, w)
         label_semana_txt.value = f"{seg.strftime('%d/%m/%Y')} – {sex.strftime('%d/%m/%Y')}  •  Sem {w:02d}/{y}"
-        dados = dados_semana(df, y, w)
+        dados = dados_semana(indice, y, w)
         hoje = datetime.now().date()
 
-        altura_total = page.height or 1080
-        altura_scroll = max(sz(360), int(altura_total - sz(380)))  # reserva header + alerts + viewbar
+        altura_scroll = alturas_scroll()["semana"]
 
-        cols = []
-        for i, nd in enumerate(PT_DIAS):
+        usados = {}
+        for i, (nd, col) in enumerate(zip(PT_DIAS, colunas_semana)):
             dia = seg + timedelta(days=i)
-            cols.append(
-                ft.Container(
-                    expand=True, width=0,
-                    content=coluna_dia(nd, dia, dados.get(i, []), destaque_hoje=(dia == hoje), altura_scroll=altura_scroll)
-                )
-            )
+            coluna_dia(col, nd, dia, dados.get(i, []), destaque_hoje=(dia == hoje), altura_scroll=altura_scroll, usados=usados)
+        cards_vivos.clear(); cards_vivos.update(usados)
 
-        grid_container.content = ft.Container(
-            padding=sz(12), bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]), border_radius=sz(16),
-            content=ft.Row(cols, spacing=sz(10), alignment=ft.MainAxisAlignment.SPACE_BETWEEN, tight=True)
-        )
+        if grid_container.content is not grade_semana:
+            grid_container.content = grade_semana
 
-    def render_hoje(y: int, w: int, df: pd.DataFrame):
-        # limpa timers e painéis
-        state["timers"].clear()
-        state["alerts_warn"].clear()
-        state["alerts_due"].clear()
-        update_alerts_panel()
+    def render_hoje(y: int, w: int, indice: IndiceSemanas):
+        # contagens voltam a ser registradas pelos cards desta tela
+        state["timers_tela"].clear()
 
         hoje = datetime.now().date()
         seg, sex = monday_friday_from_iso(y, w)
         label_semana_txt.value = f"Hoje: {hoje.strftime('%A, %d/%m/%Y').title()}  •  Sem {w:02d}/{y}"
-        dados = dados_semana(df, y, w)
-        idx = min(max((hoje - seg).days, 0), 4)
+        dados = dados_semana(indice, y, w)
+        idx = indice_dia_destaque(seg, hoje)
         dia_data = seg + timedelta(days=idx)
         registros = dados.get(idx, [])
 
-        altura_total = page.height or 1080
-        altura_scroll = max(sz(480), int(altura_total - sz(340)))
+        altura_scroll = alturas_scroll()["hoje"]
 
-        badge_hoje = ft.Container(
-            bgcolor=P["HOJE_BADGE_BG"], border_radius=sz(999),
-            padding=ft.Padding(sz(10), sz(6), sz(10), sz(6)),
-            content=ft.Row(
-                [ft.Icon(ft.Icons.TODAY, size=sz(18), color=P["PRIMARIA"]),
-                 ft.Text("Destaque do Dia", size=sz(16), weight=ft.FontWeight.W_600, color=P["PRIMARIA"])],
-                spacing=sz(6), tight=True
-            )
-        )
+        hoje_titulo.value = dia_data.strftime("%A").title()
+        hoje_data.value = dia_data.strftime("%d/%m/%Y")
+        hoje_corpo.height = altura_scroll
+        usados = {}
+        reconciliar_cards(hoje_cards, dia_data, registros, hoje, 1.12, hoje_vazio, usados)
+        cards_vivos.clear(); cards_vivos.update(usados)
 
-        cards = [card_compromisso(r, hoje=hoje, booster=1.12) for r in registros] or [
-            ft.Container(
-                padding=sz(12),
-                content=ft.Row(
-                    [ft.Icon(ft.Icons.INBOX, size=sz(22), color=P["TEXTO_SUAVE"]),
-                     ft.Text("Sem compromissos para hoje.", size=sz(20), color=P["TEXTO_SUAVE"])],
-                    spacing=sz(10)))
-        ]
+        if grid_container.content is not grade_hoje:
+            grid_container.content = grade_hoje
 
-        coluna_unica = ft.Container(
-            padding=sz(12),
-            content=ft.Column(
-                [
-                    ft.Row([
-                        ft.Text(dia_data.strftime("%A").title(), size=sz(30), weight=ft.FontWeight.W_800, color=P["PRIMARIA"]),
-                        ft.Container(width=sz(10)),
-                        badge_hoje,
-                        ft.Container(expand=True),
-                        ft.Text(dia_data.strftime("%d/%m/%Y"), size=sz(22), color=P["TEXTO_SUAVE"])
-                    ], spacing=sz(8)),
-                    ft.Container(height=sz(12)),
-                    ft.Container(
-                        height=altura_scroll,
-                        content=ft.Column(controls=cards, spacing=sz(12), scroll=ft.ScrollMode.ALWAYS, expand=True)
-                    )
-                ],
-                spacing=sz(8),
-                expand=True
-            )
-        )
+    # ---------- cache LRU de semanas montadas + pré-carga das vizinhas ----------
+    CACHE_SEMANAS_MAX = 8
+    cache_semanas: "OrderedDict[Tuple, Dict]" = OrderedDict()   # (ano, semana, visão, versão) -> cards montados
 
-        grid_container.content = ft.Container(
-            padding=sz(12), bgcolor=P["SURFACE"], border=ft.border.all(1, P["BORDA"]), border_radius=sz(16),
-            content=coluna_unica
-        )
+    def guardar_semana(chave: Tuple, cards: Dict):
+        cache_semanas[chave] = cards
+        cache_semanas.move_to_end(chave)
+        while len(cache_semanas) > CACHE_SEMANAS_MAX:
+            cache_semanas.popitem(last=False)
+
+    async def prefetch_vizinhas(y: int, w: int, view: str, versao: int):
+        hoje = datetime.now().date()
+        for delta in (1, -1):
+            await asyncio.sleep(0)   # uma semana por vez, sem segurar o laço de eventos
+            if (state["y"], state["w"], state["view"], servico.versao) != (y, w, view, versao):
+                return               # usuário já navegou ou a planilha recarregou
+            yy, ww = semana_iso_de(date.fromisocalendar(y, w, 1) + timedelta(days=7*delta))
+            chave = (yy, ww, view, versao)
+            if chave in cache_semanas: continue
+            cards = {}
+            for _, registros, booster in dias_visiveis(yy, ww, view):
+                for r, ch in zip(registros[:JANELA_CARDS], chaves_registros(registros, booster)):
+                    obter_card(r, ch, hoje, booster, cards)
+            guardar_semana(chave, cards)
 
     def render():
-        if state["view"] == "day":
-            render_hoje(state["y"], state["w"], state["df"])
-        else:
-            render_semana(state["y"], state["w"], state["df"])
+        y, w, view = state["y"], state["w"], state["view"]
+        chave = (y, w, view, servico.versao)
+        pronta = cache_semanas.get(chave)
+        with METRICAS.medir("render_ms"):
+            if pronta: cards_vivos.update(pronta)   # semana já montada (pré-carga ou visita anterior)
+            if view == "day":
+                render_hoje(y, w, servico.indice)
+            else:
+                render_semana(y, w, servico.indice)
+            guardar_semana(chave, dict(cards_vivos))
+        with METRICAS.medir("page_update_ms"):
+            page.update()
+        page.run_task(prefetch_vizinhas, y, w, view, servico.versao)
+
+    # ---------- dados do serviço ----------
+    def ao_status(carregando: bool):
+        indicador_carga.visible = carregando
         page.update()
 
-    # ---------- carga inicial ----------
-    def carregar_e_montar():
-        df = ler_planilha(CAMINHO_EXCEL)
-        state["df"] = df
-        if df.empty:
+    def ao_carregar():
+        # nova versão dos dados no serviço: refaz opções e a semana atual
+        indice = servico.indice
+        cache_semanas.clear()
+        if not indice:
             grid_container.content = ft.Container(
                 padding=sz(20), bgcolor=ft.Colors.RED_50, border=ft.border.all(1, ft.Colors.RED_400), border_radius=sz(12),
                 content=ft.Row(
@@ -538,99 +2030,115 @@ def main(page: ft.Page):
                     spacing=sz(10)))
             page.update(); return
 
-        semanas = df[["_AnoISO","_SemanaISO"]].drop_duplicates().sort_values(by=["_AnoISO","_SemanaISO"])
-        opcoes = [(int(a), int(s)) for a, s in semanas.itertuples(index=False, name=None)]
+        opcoes = sorted(indice)
         y0, w0 = semana_iso_de(datetime.now().date())
         y, w = (y0, w0) if (y0, w0) in opcoes else (opcoes[-1] if opcoes else (y0, w0))
 
-        if SHOW_DROPDOWN:
-            dd_semana.options = [
-                ft.dropdown.Option(
-                    key=f"{a}-{s}",
-                    text=f"{date.fromisocalendar(a,s,1).strftime('%d/%m')} a {date.fromisocalendar(a,s,5).strftime('%d/%m')} • {a} (Sem {s:02d})"
-                ) for a, s in opcoes
-            ]
-            dd_semana.value = f"{y}-{w}"
-
+        atualizar_opcoes_semanas()
+        if SHOW_DROPDOWN: dd_semana.value = f"{y}-{w}"
         set_week(y, w)
         update_view_buttons()
 
-    # ---------- tarefas periódicas ----------
-    async def tick_relogio():
-        while True:
-            relogio_txt.value = datetime.now().strftime("%a, %d/%m • %H:%M:%S")
-            page.update(); await asyncio.sleep(1)
-
-    async def tick_temporizador():
-        # Atualiza SOMENTE os textos dos timers e dispara alertas/sons
-        while True:
-            if state["timers"]:
-                agora = datetime.now()
-                changed = False
-                warn_changed = False
-                due_changed = False
-
-                for item in list(state["timers"]):
-                    ctrl = item["ctrl"]; alvo = item["alvo"]; nome = item["nome"]
-                    restante = alvo - agora
-
-                    # --- estado due ---
-                    if restante.total_seconds() <= 0:
-                        novo_txt = "Entrega encerrada"
-                        if ctrl.value != novo_txt:
-                            ctrl.value = novo_txt
-                            ctrl.color = ft.Colors.GREY_600
-                            changed = True
-                        if not item["due"]:
-                            item["due"] = True
-                            state["alerts_due"].add(nome)
-                            due_changed = True
-                            try: audio_due.play()
-                            except Exception as e: logging.error(f"audio_due: {e}")
-                        continue
-
-                    # --- estado warn (<=15min) ---
-                    if restante.total_seconds() <= 15*60:
-                        state["alerts_warn"].add(nome)
-                        if not item["warned"]:
-                            item["warned"] = True
-                            warn_changed = True
-                            try: audio_warn.play()
-                            except Exception as e: logging.error(f"audio_warn: {e}")
-                    else:
-                        # se saiu da janela de 15min, remove do warn (caso tenha sido render antigo)
-                        if nome in state["alerts_warn"]:
-                            state["alerts_warn"].discard(nome); warn_changed = True
-
-                    # atualiza contagem
-                    h = int(restante.total_seconds() // 3600)
-                    m = int((restante.total_seconds() % 3600) // 60)
-                    s = int(restante.total_seconds() % 60)
-                    novo_txt = f"Tempo até entrega: {h:02d}:{m:02d}:{s:02d}"
-                    if ctrl.value != novo_txt:
-                        ctrl.value = novo_txt
-                        changed = True
-
-                if warn_changed or due_changed:
-                    update_alerts_panel()
-                    changed = True
-
-                if changed:
-                    page.update()
-
-            await asyncio.sleep(INTERVALO_ATUALIZA_TEMPORIZADOR)
-
-    async def tick_reload_planilha():
-        while True:
-            await asyncio.sleep(INTERVALO_RELOAD_PLANILHA)
-            carregar_e_montar()
+    def atualizar_opcoes_semanas() -> bool:
+        if not SHOW_DROPDOWN: return False
+        opcoes = [
+            ft.dropdown.Option(
+                key=f"{a}-{s}",
+                text=f"{date.fromisocalendar(a,s,1).strftime('%d/%m')} a {date.fromisocalendar(a,s,5).strftime('%d/%m')} • {a} (Sem {s:02d})"
+            ) for a, s in sorted(servico.indice)
+        ]
+        if [o.key for o in opcoes] == [o.key for o in dd_semana.options or []]: return False
+        dd_semana.options = opcoes
+        return True
+
+    def ao_mudancas(mudancas: Mudancas):
+        # recarga parcial: descarta só as semanas tocadas; a tela só é refeita se a semana dela mudou
+        for chave in [c for c in cache_semanas if c[:2] in mudancas.semanas]:
+            del cache_semanas[chave]
+        opcoes_mudaram = atualizar_opcoes_semanas()
+        if (state["y"], state["w"]) in mudancas.semanas:
+            render()   # reconciliar_cards reaproveita os cards de chave/assinatura iguais
+        elif opcoes_mudaram:
+            page.update()
+
+    # ---------- quadro (chamado pelo laço único do serviço) ----------
+    quadro_estado = {"sujo": False}
+
+    def marcar_sujo():
+        quadro_estado["sujo"] = True
+
+    def atualizar_relogio(agora: datetime):
+        txt = agora.strftime("%a, %d/%m • %H:%M:%S")
+        if relogio_txt.value != txt:
+            relogio_txt.value = txt; marcar_sujo()
+
+    def atualizar_textos_timers(agora: datetime):
+        # só as contagens dos cards instanciados nesta tela
+        for item in state["timers_tela"]:
+            ctrl = item["ctrl"]
+            restante = item["alvo"] - agora
+            if restante.total_seconds() <= 0:
+                if ctrl.value != "Entrega encerrada":
+                    ctrl.value = "Entrega encerrada"; ctrl.color = ft.Colors.GREY_600; marcar_sujo()
+                continue
+            novo_txt = texto_temporizador(restante)
+            if ctrl.value != novo_txt:
+                ctrl.value = novo_txt; marcar_sujo()
+
+    def quadro(agora: datetime):
+        atualizar_relogio(agora)
+        atualizar_textos_timers(agora)
+        if state["versao_alertas"] != servico.versao_alertas:
+            state["versao_alertas"] = servico.versao_alertas
+            update_alerts_panel(); marcar_sujo()
+        atualizar_painel_debug()
+        if quadro_estado["sujo"]:
+            quadro_estado["sujo"] = False
+            with METRICAS.medir("page_update_ms"):
+                page.update()
+
+    def ao_alerta(kind: str):
+        audio = audio_warn if kind == "warn" else audio_due
+        try: audio.play()
+        except Exception as e: logging.error(f"audio_{kind}: {e}")
+
+    # resize (sem recalcular escala!): rajadas de eventos viram um ajuste só, depois que o
+    # tamanho assenta; só as alturas das áreas com rolagem mudam, os cards ficam
+    RESIZE_ESPERA = 0.25   # s sem novos eventos
+    resize = {"ultimo": 0.0, "agendado": False}
 
-    # resize (sem recalcular escala!)
     def on_resize(e):
-        if state["y"] and state["w"] and not state["df"].empty:
-            render()
+        resize["ultimo"] = perf_counter()
+        if not resize["agendado"]:
+            resize["agendado"] = True
+            page.run_task(assentar_resize)
+
+    async def assentar_resize():
+        while (espera := resize["ultimo"] + RESIZE_ESPERA - perf_counter()) > 0:
+            await asyncio.sleep(espera)
+        resize["agendado"] = False
+        if aplicar_alturas(): page.update()
     page.on_resized = on_resize
 
+    # esqueleto da semana de hoje enquanto não há dados (cabeçalhos + cards cinza)
+    def render_esqueleto():
+        hoje = datetime.now().date()
+        y, w = semana_iso_de(hoje)
+        seg, sex = monday_friday_from_iso(y, w)
+        label_semana_txt.value = f"{seg.strftime('%d/%m/%Y')} – {sex.strftime('%d/%m/%Y')}  •  Sem {w:02d}/{y}"
+        altura_scroll = alturas_scroll()["semana"]
+        for i, (nd, col) in enumerate(zip(PT_DIAS, colunas_semana)):
+            dia = seg + timedelta(days=i)
+            col["header"].bgcolor = P["HEADER_HOJE_BG"] if dia == hoje else P["HEADER_DIA_BG"]
+            col["titulo"].value = nd
+            col["data"].value = dia.strftime("%d/%m")
+            col["corpo"].height = altura_scroll
+            col["cards"]["view"].controls = [
+                ft.Container(height=sz(120), border_radius=sz(12), bgcolor=ft.Colors.GREY_100) for _ in range(3)]
+        grid_container.content = grade_semana
+
+    if not servico.indice: render_esqueleto()
+
     # layout
     page.add(
         header,
@@ -641,12 +2149,25 @@ def main(page: ft.Page):
         ft.Container(height=sz(10)),
         grid_container
     )
+    marcar_partida("tela")
+
+    # start: assina o serviço (a primeira sessão liga a carga e o laço de quadros)
+    instrumentar_conexao(getattr(page, "connection", None))
+    iniciar_servidor_metricas(PORTA_METRICAS)
+    sessao = dict(quadro=quadro, ao_carregar=ao_carregar, ao_mudancas=ao_mudancas, ao_status=ao_status,
+                  ao_alerta=ao_alerta)
+    page.on_close = lambda e: servico.cancelar(sessao)
+    servico.assinar(sessao, page)
 
-    # start
-    carregar_e_montar()
-    page.run_task(tick_relogio)
-    page.run_task(tick_temporizador)
-    page.run_task(tick_reload_planilha)
+    # ganchos para rodar sem tela (bench.py)
+    return dict(state=state, servico=servico, render=render, set_week=set_week, set_view=set_view, quadro=quadro)
 
 if __name__ == "__main__":
-    ft.app(target=main)
+    if MODO_EXPORTACAO:
+        # sem Flet: o serviço carrega, vigia a planilha e regrava o HTML estático
+        PASTA_EXPORTACAO = PASTA_EXPORTACAO or "export"
+        asyncio.run(obter_servico().executar())
+    elif MODO_SERVIDOR:
+        ft.app(target=main, view=ft.AppView.WEB_BROWSER, host=HOST_SERVIDOR, port=PORTA_SERVIDOR, assets_dir="assets")
+    else:
+        ft.app(target=main)
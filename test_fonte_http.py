@@ -0,0 +1,107 @@
+"""GET condicional da FonteHTTP/MonitorHTTP contra um servidor local de mentira.
+
+Uso:
+    python -m pytest -q test_fonte_http.py
+"""
+import logging, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main as app
+
+class Servidor:
+    """Publica /planilha.xlsx com ETag; /antigo redireciona para ele. Anota (caminho, status)."""
+    def __init__(self):
+        self.conteudo, self.etag, self.fora = b"versao 1", '"v1"', False
+        self.pedidos = []
+        estado = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, como um servidor de verdade
+
+            def do_GET(self):
+                if estado.fora: return self.responder(503)
+                if self.path == "/antigo":
+                    return self.responder(301, {"Location": "/planilha.xlsx"})
+                if self.headers.get("If-None-Match") == estado.etag:
+                    return self.responder(304, {"ETag": estado.etag})
+                self.responder(200, {"ETag": estado.etag}, estado.conteudo)
+
+            def responder(self, status, cabecalhos=None, corpo=b""):
+                estado.pedidos.append((self.path, status))
+                self.send_response(status)
+                for k, v in (cabecalhos or {}).items(): self.send_header(k, v)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *a): pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def publicar(self, conteudo: bytes, etag: str):
+        self.conteudo, self.etag = conteudo, etag
+
+    def desligar(self):
+        self.httpd.shutdown(); self.httpd.server_close()
+
+@pytest.fixture
+def servidor():
+    s = Servidor()
+    yield s
+    s.desligar()
+
+def ler(fonte: app.FonteHTTP) -> bytes:
+    with open(fonte.arquivo, "rb") as f: return f.read()
+
+def test_200_depois_304_com_etag(servidor, tmp_path):
+    fonte = app.FonteHTTP(servidor.url + "/planilha.xlsx", str(tmp_path))
+    assert fonte.buscar() is True
+    assert ler(fonte) == b"versao 1" and fonte.validadores["etag"] == '"v1"'
+    assert fonte.buscar() is False   # If-None-Match bate: 304, cópia intacta
+    assert servidor.pedidos == [("/planilha.xlsx", 200), ("/planilha.xlsx", 304)]
+    assert ler(fonte) == b"versao 1"
+
+    servidor.publicar(b"versao 2", '"v2"')
+    assert fonte.buscar() is True
+    assert ler(fonte) == b"versao 2"
+
+def test_validadores_sobrevivem_ao_reinicio(servidor, tmp_path):
+    app.FonteHTTP(servidor.url + "/planilha.xlsx", str(tmp_path)).buscar()
+    nova = app.FonteHTTP(servidor.url + "/planilha.xlsx", str(tmp_path))   # app reiniciado
+    assert nova.buscar() is False
+    assert servidor.pedidos[-1] == ("/planilha.xlsx", 304)
+
+def test_redirecionamento(servidor, tmp_path):
+    fonte = app.FonteHTTP(servidor.url + "/antigo", str(tmp_path))
+    assert fonte.buscar() is True
+    assert ler(fonte) == b"versao 1"
+    assert servidor.pedidos == [("/antigo", 301), ("/planilha.xlsx", 200)]
+
+def test_queda_mantem_ultima_copia(servidor, tmp_path, caplog):
+    fonte = app.FonteHTTP(servidor.url + "/planilha.xlsx", str(tmp_path))
+    assert fonte.buscar() is True
+
+    servidor.fora = True   # servidor responde, mas com erro
+    assert fonte.buscar() is False
+    assert ler(fonte) == b"versao 1"
+
+    servidor.desligar(); fonte._fechar()   # fora do ar: nem conecta
+    with caplog.at_level(logging.ERROR):
+        assert fonte.buscar() is False
+    assert ler(fonte) == b"versao 1"
+    assert "mantendo a última cópia" in caplog.text
+
+def test_monitor_so_acusa_conteudo_novo(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "INTERVALO_VERIFICA_URL", 0)
+    monitor = app.MonitorHTTP(app.FonteHTTP(servidor.url + "/planilha.xlsx", str(tmp_path)))
+    monitor.marcar()                  # primeira carga baixa a cópia
+    assert monitor.mudou() is False   # 304
+    servidor.publicar(b"versao 2", '"v2"')
+    assert monitor.mudou() is True
+    monitor.marcar()                  # a carga usa a cópia que mudou() já trouxe, sem outro GET
+    assert servidor.pedidos[-1] == ("/planilha.xlsx", 200)
+    assert ler(monitor.fonte) == b"versao 2"
@@ -0,0 +1,58 @@
+"""normalizar_datas/normalizar_horas (em lote) devem dar o mesmo que to_date_safe/to_time_safe
+(célula a célula), inclusive nos valores que só o conversor antigo sabe tratar.
+
+Uso:
+    python -m pytest -q test_normalizacao.py
+"""
+from datetime import date, datetime, time
+
+import pandas as pd
+
+import main as app
+
+DATAS = [
+    "12/10/2026", "2026-10-12", "12-10-2026", "12/10/26", "1/3/2026", " 12/10/2026 ",
+    "31/02/2026", "03/02/0205", "31/12/2999", "2999-12-31", "01/01/1500", "abc", "", None,
+    datetime(2026, 10, 12, 9, 30), datetime(2999, 12, 31), pd.Timestamp("2026-10-13"),
+    date(2026, 10, 14), date(205, 2, 3), 46000, 46000.5,
+]
+
+HORAS = [
+    "09:00", "9:05", "07:05:30", "07:05:60", "23:59:59", "9h", "9h30", "9", "25:00", "abc", "", None,
+    time(9, 15, 42), datetime(2026, 10, 12, 14, 45, 10), pd.Timestamp("2026-10-12 08:20:30"),
+    9, 9.5, 13.25,
+]
+
+def celula(conversor, v):
+    r = conversor(v)
+    return None if r is pd.NaT else r   # NaT.date() do conversor antigo = vazio, como None
+
+def test_datas_iguais_ao_conversor_por_celula():
+    s = pd.Series(DATAS, dtype=object)
+    assert list(app.normalizar_datas(s)) == [celula(app.to_date_safe, v) for v in DATAS]
+
+def test_datas_so_texto_fora_da_faixa_do_ns():
+    # coluna só de texto: tudo passa pelo caminho vetorizado, sem cair na carga inteira
+    valores = ["12/10/2026", "03/02/0205", "31/12/2999", "13/10/2026"]
+    assert list(app.normalizar_datas(pd.Series(valores))) == [celula(app.to_date_safe, v) for v in valores]
+
+def test_horas_iguais_ao_conversor_por_celula():
+    s = pd.Series(HORAS, dtype=object)
+    assert list(app.normalizar_horas(s)) == [celula(app.to_time_safe, v) for v in HORAS]
+
+def test_coluna_datetime64():
+    s = pd.Series([pd.Timestamp(2026, 10, 12, 9, 30), pd.NaT, pd.Timestamp(2026, 10, 13, 18, 5, 59)])
+    assert list(app.normalizar_datas(s)) == [date(2026, 10, 12), None, date(2026, 10, 13)]
+    assert list(app.normalizar_horas(s)) == [time(9, 30), None, time(18, 5)]
+
+def test_planilha_com_ano_fora_da_faixa_carrega(tmp_path):
+    import openpyxl
+    wb = openpyxl.Workbook(); ws = wb.active; ws.title = app.ABA_EXCEL
+    ws.append(["Data", "Hora", "Nome"])
+    ws.append(["12/10/2026", "09:00", "A"])
+    ws.append(["03/02/0205", "09:00", "B"])   # domingo: fica fora (seg..sex), mas não derruba a carga
+    ws.append(["31/12/2999", "07:05:60", "C"])
+    arq = tmp_path / "anos.xlsx"; wb.save(arq)
+    df = app.ler_planilha(str(arq))
+    assert list(df["_Nome"]) == ["A", "C"]
+    assert list(df["_Hora"]) == [time(9, 0), None]